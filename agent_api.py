@@ -1,39 +1,134 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
 
-import base64
-import json
 import logging
+import logging.handlers
+import os
+import platform
+import queue
+import re
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
 
-from flask import Flask, jsonify, request
+import orjson  # pip install orjson
+import pybase64  # pip install pybase64
+import xxhash  # pip install xxhash
+from waitress import serve  # pip install waitress
 
 from cryptography.hazmat.primitives import hashes, serialization
 from cryptography.hazmat.primitives.asymmetric import padding as asym_padding
-from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.primitives.asymmetric import x25519
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 
 from config import ROOT_DIR
-from src.db import upsert_agent_inventory  # ← ВАЖНО: src.db, а не db
+from src.db import SoftwareRow, upsert_agent_inventory  # ← ВАЖНО: src.db, а не db
 
-app = Flask(__name__)
 log = logging.getLogger(__name__)
 
+REPORT_PATH = '/api/agent/report'
+
+# RSA-2048 OAEP даёт 256 байт шифротекста (~344 символа base64) — 1 КБ с запасом
+MAX_ENC_KEY_B64 = 1024
+# Потолок на весь отчёт агента; больше — отбрасываем до расшифровки
+MAX_PAYLOAD_BYTES = 8 * 1024 * 1024
+MAX_ENC_DATA_B64 = MAX_PAYLOAD_BYTES
+
+_B64_RE = re.compile(r'[A-Za-z0-9+/]+={0,2}')
+
+# Раскладка enc_data:
+#   'nonce|tag|ct' — исходный формат агентов (по умолчанию);
+#   'nonce|ct|tag' — нативный для AEAD, расшифровывается без пересборки буфера.
+ENC_LAYOUT_LEGACY = 'nonce|tag|ct'
+ENC_LAYOUT_NATIVE = 'nonce|ct|tag'
+
 # По умолчанию кладём сюда, но app_unified потом переопределяет:
 PRIVATE_KEY_PATH: Path = ROOT_DIR / 'server_private_key.pem'
 LOG_PATH: Path = ROOT_DIR / 'agent_api.log'
 
+# Приватный ключ загружается один раз в run_agent_api
+_PRIV_KEY: Any = None
+
+# Параметры OAEP неизменяемы — создаём один раз, а не на каждый запрос
+_OAEP_PADDING = asym_padding.OAEP(
+    mgf=asym_padding.MGF1(algorithm=hashes.SHA256()),
+    algorithm=hashes.SHA256(),
+    label=None,
+)
+
+# Контекст HKDF для варианта с X25519 (должен совпадать с агентом)
+_X25519_HKDF_INFO = b'agent-report-aes-key'
+
+
+_log_listener: Optional[logging.handlers.QueueListener] = None
+
 
 def _setup_logging() -> None:
+    """
+    Потоки запросов только кладут записи в очередь,
+    запись в файл/консоль делает фоновый QueueListener.
+    """
+    global _log_listener
+    if _log_listener is not None:
+        return
+
     LOG_PATH.parent.mkdir(parents=True, exist_ok=True)
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s [%(levelname)s] %(message)s',
-        handlers=[
-            logging.FileHandler(LOG_PATH, encoding='utf-8'),
-            logging.StreamHandler(),
-        ],
+    formatter = logging.Formatter('%(asctime)s [%(levelname)s] %(message)s')
+    file_handler = logging.handlers.RotatingFileHandler(
+        LOG_PATH,
+        maxBytes=10 * 1024 * 1024,
+        backupCount=3,
+        encoding='utf-8',
+        delay=True,
     )
+    stream_handler = logging.StreamHandler()
+    for h in (file_handler, stream_handler):
+        h.setFormatter(formatter)
+
+    log_q: queue.SimpleQueue = queue.SimpleQueue()
+    logging.basicConfig(level=logging.INFO, handlers=[logging.handlers.QueueHandler(log_q)])
+
+    _log_listener = logging.handlers.QueueListener(log_q, file_handler, stream_handler)
+    _log_listener.start()
+
+
+def _cpu_flags() -> Optional[set[str]]:
+    try:
+        with open('/proc/cpuinfo', encoding='utf-8') as f:
+            for line in f:
+                if line.startswith('flags'):
+                    return set(line.split(':', 1)[1].split())
+    except OSError:
+        pass
+    return None
+
+
+def _check_crypto_acceleration() -> None:
+    """
+    Расшифровка AES-GCM без AES-NI/PCLMULQDQ медленнее на порядок.
+    Пишем версию OpenSSL и предупреждаем, если ускорение явно недоступно.
+    """
+    try:
+        from cryptography.hazmat.backends.openssl.backend import backend
+        log.info('OpenSSL: %s', backend.openssl_version_text())
+    except Exception:
+        pass
+
+    cap = os.environ.get('OPENSSL_ia32cap')
+    if cap:
+        log.warning('Задан OPENSSL_ia32cap=%s — аппаратное ускорение AES может быть отключено', cap)
+
+    if platform.machine().lower() not in ('x86_64', 'amd64'):
+        return
+    flags = _cpu_flags()
+    if flags is None:
+        return
+    missing = {'aes', 'pclmulqdq'} - flags
+    if missing:
+        log.warning(
+            'CPU не поддерживает %s — AES-GCM будет работать без аппаратного ускорения',
+            ', '.join(sorted(missing)),
+        )
 
 
 def _load_private_key(path: Path):
@@ -41,77 +136,175 @@ def _load_private_key(path: Path):
     return serialization.load_pem_private_key(data, password=None)
 
 
+def _unwrap_aes_key(priv_key, enc_key: bytes) -> bytes:
+    """
+    Получение AES-ключа из enc_key в зависимости от типа ключа сервера:
+    - X25519: enc_key — эфемерный публичный ключ агента (32 байта),
+      AES-ключ = HKDF-SHA256(ECDH), что на порядки дешевле RSA;
+    - RSA: enc_key — AES-ключ, зашифрованный RSA-OAEP.
+    """
+    if isinstance(priv_key, x25519.X25519PrivateKey):
+        shared = priv_key.exchange(x25519.X25519PublicKey.from_public_bytes(enc_key))
+        return HKDF(
+            algorithm=hashes.SHA256(),
+            length=32,
+            salt=None,
+            info=_X25519_HKDF_INFO,
+        ).derive(shared)
+    return priv_key.decrypt(enc_key, _OAEP_PADDING)
+
+
+def _norm_str(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    return str(value).strip() or None
+
+
+def _quick_validate(raw: Any) -> Optional[str]:
+    """
+    Дешёвые структурные проверки до расшифровки, чтобы заведомо
+    битые запросы не доходили до RSA/AES.
+    Возвращает код ошибки или None, если всё в порядке.
+    """
+    if not isinstance(raw, dict):
+        return 'bad_json'
+
+    enc_key = raw.get('enc_key')
+    enc_data = raw.get('enc_data')
+    if not enc_key or not enc_data:
+        return 'enc_key_or_enc_data_missing'
+    if not isinstance(enc_key, str) or not isinstance(enc_data, str):
+        return 'bad_payload'
+    if len(enc_key) > MAX_ENC_KEY_B64 or len(enc_data) > MAX_ENC_DATA_B64:
+        return 'payload_too_large'
+    if raw.get('enc_layout', ENC_LAYOUT_LEGACY) not in (ENC_LAYOUT_LEGACY, ENC_LAYOUT_NATIVE):
+        return 'bad_payload'
+    for value in (enc_key, enc_data):
+        if len(value) % 4 or not _B64_RE.fullmatch(value):
+            return 'bad_payload'
+    return None
+
+
 def _decrypt_payload(
     priv_key,
     enc_key_b64: str,
     enc_data_b64: str,
+    layout: str = ENC_LAYOUT_LEGACY,
 ) -> Dict[str, Any]:
     """
     Расшифровка данных от агента:
-    1) RSA-OAEP: enc_key -> AES-ключ
+    1) RSA-OAEP или X25519+HKDF: enc_key -> AES-ключ
     2) AES-GCM: enc_data -> JSON
     """
-    enc_key = base64.b64decode(enc_key_b64)
-    enc_data = base64.b64decode(enc_data_b64)
+    if len(enc_key_b64) > MAX_ENC_KEY_B64 or len(enc_data_b64) > MAX_ENC_DATA_B64:
+        raise ValueError('payload_too_large')
 
-    aes_key = priv_key.decrypt(
-        enc_key,
-        asym_padding.OAEP(
-            mgf=asym_padding.MGF1(algorithm=hashes.SHA256()),
-            algorithm=hashes.SHA256(),
-            label=None,
-        ),
-    )
+    # алфавит уже проверен в _quick_validate, повторная валидация не нужна
+    enc_key = pybase64.b64decode(enc_key_b64, validate=False)
+    enc_data = pybase64.b64decode(enc_data_b64, validate=False)
+
+    aes_key = _unwrap_aes_key(priv_key, enc_key)
 
-    # Формат: nonce(12) + tag(16) + ciphertext
     if len(enc_data) < 12 + 16:
         raise ValueError('enc_data too short')
 
-    nonce = enc_data[:12]
-    tag = enc_data[12:28]
-    ciphertext = enc_data[28:]
+    # срезы memoryview не копируют буфер
+    mv = memoryview(enc_data)
+    nonce = mv[:12]
+
+    if layout == ENC_LAYOUT_NATIVE:
+        # nonce(12) + ciphertext + tag(16) — ровно то, что ждёт AESGCM
+        ct_and_tag = mv[12:]
+    else:
+        # nonce(12) + tag(16) + ciphertext — собираем ciphertext || tag за одно копирование
+        ct_and_tag = b''.join((mv[28:], mv[12:28]))
+
+    plaintext = AESGCM(aes_key).decrypt(nonce, ct_and_tag, None)
 
-    decryptor = Cipher(
-        algorithms.AES(aes_key),
-        modes.GCM(nonce, tag),
-    ).decryptor()
-    plaintext = decryptor.update(ciphertext) + decryptor.finalize()
+    return orjson.loads(plaintext)
 
-    return json.loads(plaintext.decode('utf-8'))
 
+_STATUS_LINES = {
+    200: '200 OK',
+    400: '400 Bad Request',
+    404: '404 Not Found',
+    405: '405 Method Not Allowed',
+    413: '413 Payload Too Large',
+    500: '500 Internal Server Error',
+}
 
-@app.route('/api/agent/report', methods=['POST'])
-def agent_report() -> Any:
+
+# (строка статуса, заголовки, тело) — готовый ответ для start_response
+_Response = Tuple[str, List[Tuple[str, str]], bytes]
+
+
+def _make_response(obj: Dict[str, Any], status: int) -> _Response:
+    body = orjson.dumps(obj)
+    headers = [
+        ('Content-Type', 'application/json'),
+        ('Content-Length', str(len(body))),
+    ]
+    return _STATUS_LINES[status], headers, body
+
+
+# Ответы постоянные — сериализуем их один раз при импорте
+_ERROR_STATUS = {
+    'bad_json': 400,
+    'bad_payload': 400,
+    'enc_key_or_enc_data_missing': 400,
+    'decrypt_failed': 400,
+    'agent_id_missing': 400,
+    'not_found': 404,
+    'method_not_allowed': 405,
+    'payload_too_large': 413,
+    'private_key_error': 500,
+    'db_error': 500,
+}
+_ERROR_RESPONSES: Dict[str, _Response] = {
+    code: _make_response({'error': code}, status)
+    for code, status in _ERROR_STATUS.items()
+}
+_OK_RESPONSE = _make_response({'status': 'ok'}, 200)
+
+
+def agent_report(body: bytes) -> _Response:
     """
-    Приём отчёта от агента.
+    Приём отчёта от агента (тело POST-запроса).
+    Возвращает готовый ответ (статус, заголовки, тело).
     Ждём JSON:
     {
       "enc_key": "...",
-      "enc_data": "..."
+      "enc_data": "...",
+      "enc_layout": "nonce|ct|tag"   // необязательно, по умолчанию nonce|tag|ct
     }
     """
     try:
-        raw = request.get_json(force=True, silent=False)
+        raw = orjson.loads(body)
     except Exception as exc:
         log.error('bad json: %r', exc)
-        return jsonify({'error': 'bad_json'}), 400
+        return _ERROR_RESPONSES['bad_json']
 
-    enc_key = (raw or {}).get('enc_key')
-    enc_data = (raw or {}).get('enc_data')
-    if not enc_key or not enc_data:
-        return jsonify({'error': 'enc_key_or_enc_data_missing'}), 400
+    error = _quick_validate(raw)
+    if error is not None:
+        return _ERROR_RESPONSES[error]
 
-    try:
-        priv_key = _load_private_key(PRIVATE_KEY_PATH)
-    except Exception as exc:
-        log.error('cannot load private key %s: %r', PRIVATE_KEY_PATH, exc)
-        return jsonify({'error': 'private_key_error'}), 500
+    enc_key = raw['enc_key']
+    enc_data = raw['enc_data']
+
+    priv_key = _PRIV_KEY
+    if priv_key is None:
+        return _ERROR_RESPONSES['private_key_error']
 
     try:
-        payload = _decrypt_payload(priv_key, enc_key, enc_data)
+        payload = _decrypt_payload(
+            priv_key,
+            enc_key,
+            enc_data,
+            layout=raw.get('enc_layout', ENC_LAYOUT_LEGACY),
+        )
     except Exception as exc:
         log.error('decrypt_failed: %r', exc)
-        return jsonify({'error': 'decrypt_failed'}), 400
+        return _ERROR_RESPONSES['decrypt_failed']
 
     agent_id = payload.get('agent_id')
     os_info = payload.get('os_info') or {}
@@ -119,7 +312,19 @@ def agent_report() -> Any:
     ip_address = payload.get('ip_address') or None
 
     if not agent_id:
-        return jsonify({'error': 'agent_id_missing'}), 400
+        return _ERROR_RESPONSES['agent_id_missing']
+
+    # нормализуем один раз здесь; в БД уходят готовые кортежи
+    software_rows: List[SoftwareRow] = [
+        (name, _norm_str(item.get('version')), _norm_str(item.get('publisher')))
+        for item in software
+        if isinstance(item, dict) and (name := _norm_str(item.get('name')))
+    ]
+
+    # криптостойкость не нужна — xxh3 лишь отличает изменившийся список ПО;
+    # с сохранённым отпечатком его сравнивает upsert_agent_inventory
+    # в транзакции записи
+    digest = xxhash.xxh3_64(orjson.dumps(software_rows)).digest()
 
     try:
         upsert_agent_inventory(
@@ -130,11 +335,12 @@ def agent_report() -> Any:
             os_version=os_info.get('os_version'),
             architecture=os_info.get('architecture'),
             ip_address=ip_address,
-            software_list=software,
+            software_rows=software_rows,
+            software_digest=digest,
         )
     except Exception as exc:
         log.exception('db_error while saving agent report: %r', exc)
-        return jsonify({'error': 'db_error'}), 500
+        return _ERROR_RESPONSES['db_error']
 
     log.info(
         'Принят отчёт от агента %s (%s), ПО: %d записей',
@@ -142,14 +348,60 @@ def agent_report() -> Any:
         ip_address or os_info.get('hostname') or 'unknown',
         len(software),
     )
-    return jsonify({'status': 'ok'}), 200
+    return _OK_RESPONSE
+
+
+def _content_length(environ: Dict[str, Any]) -> int:
+    try:
+        return max(0, int(environ.get('CONTENT_LENGTH') or 0))
+    except ValueError:
+        return 0
+
+
+def _read_body(environ: Dict[str, Any], length: int) -> bytes:
+    if length <= 0:
+        return b''
+    return environ['wsgi.input'].read(length)
+
+
+def app(environ: Dict[str, Any], start_response: Callable[..., Any]) -> Iterable[bytes]:
+    """
+    WSGI-приложение с единственным маршрутом POST /api/agent/report.
+    Flask здесь не нужен: ни шаблонов, ни других маршрутов нет,
+    а его Request/контексты/роутинг — лишняя работа на каждый запрос.
+    """
+    if environ.get('PATH_INFO') != REPORT_PATH:
+        response = _ERROR_RESPONSES['not_found']
+    elif environ.get('REQUEST_METHOD') != 'POST':
+        response = _ERROR_RESPONSES['method_not_allowed']
+    else:
+        length = _content_length(environ)
+        if length > MAX_PAYLOAD_BYTES:
+            response = _ERROR_RESPONSES['payload_too_large']
+        else:
+            response = agent_report(_read_body(environ, length))
+
+    status_line, headers, payload = response
+    start_response(status_line, headers)
+    return [payload]
 
 
 def run_agent_api(host: str = '0.0.0.0', port: int = 8000) -> None:
     """
-    Запуск Flask-приложения (вызывается из app_unified).
+    Запуск WSGI-приложения (вызывается из app_unified).
+    Вместо dev-сервера Werkzeug используем waitress: пул потоков
+    и нормальный HTTP-парсер, без перезапуска и отладочных обёрток.
     """
+    global _PRIV_KEY
     _setup_logging()
+    _check_crypto_acceleration()
+    # ошибка загрузки ключа всплывает сразу при старте, а не на каждом запросе
+    _PRIV_KEY = _load_private_key(PRIVATE_KEY_PATH)
     logging.info('Запуск agent API на %s:%d', host, port)
-    # threaded=True — чтобы не блокировать основной поток GUI
-    app.run(host=host, port=port, threaded=True, use_reloader=False)
+    serve(
+        app,
+        host=host,
+        port=port,
+        threads=16,
+        max_request_body_size=MAX_PAYLOAD_BYTES,
+    )
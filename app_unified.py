@@ -2,12 +2,16 @@
 from __future__ import annotations
 
 import threading
+import concurrent.futures
+import functools
 import multiprocessing as mp
+import multiprocessing.pool
 import os
 import re
 import sqlite3
 import sys
 import json
+import time
 from pathlib import Path
 from typing import Optional
 
@@ -15,18 +19,18 @@ import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext, filedialog
 
 from config import ROOT_DIR
-from src.ids import iter_ids
-from src.processing import process_range_from_to
+from src.ids import count_ids
+from src.processing import create_worker_pool, process_range_from_to
 from src.top_vulnerability import get_latest_bdu_id
 from src.sv_latest import scrape_latest
-from src.db import init_db, DB_PATH, insert_vulnerabilities
+from src.db import init_db, open_connection, insert_vulnerabilities
 from src.browser_env import browser_ready, browser_requirements_text
 from src.key_utils import generate_rsa_keypair
 import agent_api
 from src.reporting import generate_vulnerability_report
 
 
-BDU_RE = re.compile(r'^\d{4}-\d+$')
+BDU_RE = re.compile(r'^(?P<y>\d{4})-(?P<n>\d+)$')
 
 
 class UnifiedApp(tk.Tk):
@@ -49,16 +53,36 @@ class UnifiedApp(tk.Tk):
         self.agent_api_port = tk.IntVar(value=8000)
         self.private_key_path = tk.StringVar()
 
-        self._progress_q: Optional[mp.Queue] = None
-        self._status_q: Optional[mp.Queue] = None
-        self._status_running = False
+        # общая очередь статусов и прогресса (см. _queue_listener)
+        self._status_q: Optional[mp.SimpleQueue] = None
         self._progress_total = 0
         self._progress_done = 0
 
         self._agent_api_thread: Optional[threading.Thread] = None
+        # (BDU-ID, time.monotonic()) последнего успешного запроса к сайту ФСТЭК
+        self._latest_bdu_cache: Optional[tuple[str, float]] = None
+
+        self._log_buffer: list[str] = []
+        self._log_lock = threading.Lock()
+        self._log_flush_scheduled = False
+        # пул воркеров ФСТЭК создаётся при первом запуске и живёт до закрытия окна
+        self._pool: Optional[mp.pool.Pool] = None
+        self._pool_size = max(1, mp.cpu_count() // 2)
         self._settings_path = ROOT_DIR / 'app_settings.json'
 
+        # схема создаётся один раз; дальше запросы идут через одно соединение
+        # (используется из фонового потока run_one, поэтому check_same_thread=False)
+        init_db()
+        self._db: sqlite3.Connection = open_connection(check_same_thread=False)
+        # здесь только чтение — неявные транзакции не нужны
+        self._db.isolation_level = None
+
         self._load_settings()
+        # файл настроек переписываем только если что-то поменялось
+        # (или его ещё нет — тогда сохраняем значения по умолчанию)
+        self._settings_dirty = not self._settings_path.exists()
+        for var in self._persisted_vars():
+            var.trace_add('write', self._mark_settings_dirty)
         self._build_ui()
         self.protocol('WM_DELETE_WINDOW', self._on_close)
 
@@ -163,7 +187,8 @@ class UnifiedApp(tk.Tk):
         self.pb.pack(side=tk.LEFT, fill=tk.X, expand=True)
 
         self.pb_style_name = 'text.Horizontal.TProgressbar'
-        style = ttk.Style(self)
+        self._style = ttk.Style(self)
+        style = self._style
         style.layout(self.pb_style_name, [
             ('Horizontal.Progressbar.trough', {
                 'children': [('Horizontal.Progressbar.pbar', {'side': 'left', 'sticky': 'ns'})],
@@ -172,6 +197,7 @@ class UnifiedApp(tk.Tk):
             ('Horizontal.Progressbar.label', {'sticky': ''}),
         ])
         style.configure(self.pb_style_name, text='0 / 0', anchor='center')
+        self._last_label_text = '0 / 0'
         self.pb.configure(style=self.pb_style_name)
 
         out = ttk.LabelFrame(self, text='Вывод')
@@ -186,124 +212,172 @@ class UnifiedApp(tk.Tk):
 
         self._reset_progress_view()
 
+    def _set_progress_text(self, text: str) -> None:
+        # перенастройка стиля Tk дорогая, а прогресс тикает на каждый ID
+        if text == self._last_label_text:
+            return
+        self._last_label_text = text
+        self._style.configure(self.pb_style_name, text=text)
+
     def _reset_progress_view(self, total: int = 0) -> None:
         self._progress_total = total
         self._progress_done = 0
         self.pb.configure(mode='determinate', maximum=max(1, total), value=0)
-        ttk.Style().configure(self.pb_style_name, text=f'0 / {total}')
+        self._set_progress_text(f'0 / {total}')
 
     def _progress_set_total(self, total: int) -> None:
         self._progress_total = max(0, int(total))
         self._progress_done = 0
         self.pb.configure(mode='determinate', maximum=max(1, self._progress_total), value=0)
-        ttk.Style().configure(self.pb_style_name, text=f'0 / {self._progress_total}')
+        self._set_progress_text(f'0 / {self._progress_total}')
 
-    def _progress_inc(self) -> None:
+    def _progress_inc(self, n: int = 1) -> None:
         if self._progress_done < self._progress_total:
-            self._progress_done += 1
+            self._progress_done = min(self._progress_total, self._progress_done + n)
             self.pb['value'] = self._progress_done
-            ttk.Style().configure(
-                self.pb_style_name,
-                text=f'{self._progress_done} / {self._progress_total}',
-            )
+            self._set_progress_text(f'{self._progress_done} / {self._progress_total}')
 
     def _progress_finish(self) -> None:
         if self._progress_total > 0:
             self._progress_done = self._progress_total
             self.pb['value'] = self._progress_total
-            ttk.Style().configure(
-                self.pb_style_name,
-                text=f'{self._progress_total} / {self._progress_total}',
-            )
+            self._set_progress_text(f'{self._progress_total} / {self._progress_total}')
 
-    def _append_log(self, text: str) -> None:
-        def append() -> None:
-            self.txt_out.configure(state='normal')
-            self.txt_out.insert(tk.END, text)
-            self.txt_out.configure(state='disabled')
-            self.txt_out.yview(tk.END)
+    def _apply_progress(self, total: Optional[int], delta: int) -> None:
+        if total is not None:
+            self._progress_set_total(total)
+        if delta:
+            self._progress_inc(delta)
 
-        self.txt_out.after(0, append)
+    def _write_log(self, text: str) -> None:
+        self.txt_out.configure(state='normal')
+        self.txt_out.insert(tk.END, text)
+        self.txt_out.configure(state='disabled')
+        self.txt_out.yview(tk.END)
 
-    def _status_listener(self, q: mp.Queue) -> None:
-        self._status_running = True
-        while self._status_running:
-            try:
-                item = q.get(timeout=0.5)
-            except Exception:
-                continue
+    # строки лога копятся в буфере и вставляются одним insert раз в LOG_FLUSH_MS:
+    # пачка сообщений даёт одно событие Tk, а не по событию на строку
+    LOG_FLUSH_MS = 50
+
+    def _append_log(self, text: str) -> None:
+        with self._log_lock:
+            self._log_buffer.append(text)
+            if self._log_flush_scheduled:
+                return
+            self._log_flush_scheduled = True
+        self.txt_out.after(self.LOG_FLUSH_MS, self._flush_log_buffer)
+
+    def _flush_log_buffer(self) -> None:
+        with self._log_lock:
+            text = ''.join(self._log_buffer)
+            self._log_buffer.clear()
+            self._log_flush_scheduled = False
+        if text:
+            self._write_log(text)
 
-            if isinstance(item, str):
-                msg = item
-                if not msg.endswith('\n'):
-                    msg += '\n'
-                self._append_log(msg)
+    # Сигнал слушателю очереди: работа завершена, поток можно останавливать
+    _STOP = None
 
-    def _progress_listener(self, q: mp.Queue) -> None:
-        self._status_running = True
-        while self._status_running:
+    def _queue_listener(self, q: mp.SimpleQueue) -> None:
+        """
+        Один поток на одну очередь: статусы (str), прогресс (int — число
+        обработанных ID) и ('TOTAL', n) различаются по типу сообщения;
+        список — пачка таких сообщений от воркера.
+        За одно пробуждение выбирается всё накопившееся: текст уходит
+        одной строкой в буфер лога, прогресс — одним after_idle.
+        """
+        stop = False
+        while not stop:
             try:
-                item = q.get(timeout=0.5)
+                item = q.get()
             except Exception:
-                continue
+                return
 
-            if isinstance(item, tuple) and len(item) == 2 and item[0] == 'TOTAL':
+            lines: list[str] = []
+            total: Optional[int] = None
+            delta = 0
+            while True:
+                # воркеры шлют пачки сообщений списком (см. workers._QueueBatcher)
+                for part in (item if isinstance(item, list) else (item,)):
+                    if part is self._STOP:
+                        stop = True
+                        break
+                    if isinstance(part, str):
+                        lines.append(part if part.endswith('\n') else part + '\n')
+                    elif isinstance(part, tuple) and len(part) == 2 and part[0] == 'TOTAL':
+                        try:
+                            total = int(part[1])
+                        except Exception:
+                            total = 0
+                        delta = 0
+                    elif isinstance(part, int):
+                        delta += part
+                    # прочее (например, {'result_path': ...} из processing) — не для GUI
+                if stop:
+                    break
                 try:
-                    total = int(item[1])
+                    if q.empty():
+                        break
+                    item = q.get()
                 except Exception:
-                    total = 0
-                self._progress_set_total(total)
-            else:
-                self._progress_inc()
+                    break
+
+            if lines:
+                self._append_log(''.join(lines))
+            if total is not None or delta:
+                self.after_idle(self._apply_progress, total, delta)
+
+        self.after_idle(self._progress_finish)
 
+    # одни и те же ID (с сайта, из БД) разбираются повторно — кэшируем
     @staticmethod
+    @functools.lru_cache(maxsize=256)
     def _inc_bdu_id(bdu_id: str) -> str:
-        try:
-            year_str, num_str = bdu_id.split('-')
-            year = int(year_str)
-            width = len(num_str)
-            new_num = int(num_str) + 1
-            return f'{year}-{new_num:0{width}d}'
-        except Exception:
+        m = BDU_RE.match(bdu_id)
+        if not m:
             return bdu_id
+        num_str = m['n']
+        return f"{m['y']}-{int(num_str) + 1:0{len(num_str)}d}"
 
     @staticmethod
+    @functools.lru_cache(maxsize=256)
     def _parse_bdu_id(bdu_id: str) -> tuple[int, str, int]:
-        year_str, num_str = bdu_id.split('-', 1)
-        year = int(year_str)
-        width = len(num_str)
-        return year, num_str, width
+        m = BDU_RE.match(bdu_id)
+        if not m:
+            raise ValueError(f'Некорректный BDU-ID: {bdu_id}')
+        num_str = m['n']
+        return int(m['y']), num_str, len(num_str)
 
-    def _get_last_bdu_id_from_db(self) -> Optional[str]:
-        init_db()
-        conn = sqlite3.connect(str(DB_PATH))
-        try:
-            cur = conn.execute(
-                'SELECT bdu_id FROM vulnerabilities '
-                'WHERE source = ? AND bdu_id IS NOT NULL '
-                'ORDER BY id DESC LIMIT 1',
-                ('fstek',),
-            )
-            row = cur.fetchone()
-            return row[0] if row and row[0] else None
-        finally:
-            conn.close()
+    def _fstek_state(self, site_bdu_id: str) -> tuple[Optional[str], bool]:
+        """
+        Последний BDU-ID ФСТЭК в БД и признак наличия site_bdu_id —
+        одним запросом (оба подзапроса идут по индексу (source, bdu_id)).
+        """
+        cur = self._db.execute(
+            'SELECT '
+            '(SELECT bdu_id FROM vulnerabilities '
+            " WHERE source = 'fstek' AND bdu_id IS NOT NULL "
+            ' ORDER BY bdu_id DESC LIMIT 1), '
+            "EXISTS(SELECT 1 FROM vulnerabilities WHERE source = 'fstek' AND bdu_id = ?)",
+            (site_bdu_id,),
+        )
+        row = cur.fetchone()
+        if not row:
+            return None, False
+        return (row[0] or None), bool(row[1])
 
-    def _bdu_id_exists_in_db(self, bdu_id: str) -> bool:
-        if not bdu_id:
-            return False
-        init_db()
-        conn = sqlite3.connect(str(DB_PATH))
-        try:
-            cur = conn.execute(
-                'SELECT 1 FROM vulnerabilities '
-                'WHERE source = ? AND bdu_id = ? '
-                'LIMIT 1',
-                ('fstek', bdu_id),
-            )
-            return cur.fetchone() is not None
-        finally:
-            conn.close()
+    # повторные запуски в течение минуты не поднимают браузер ради того же ID
+    LATEST_BDU_TTL = 60.0
+
+    def _latest_site_bdu_id(self) -> Optional[str]:
+        cached = self._latest_bdu_cache
+        if cached is not None and time.monotonic() - cached[1] < self.LATEST_BDU_TTL:
+            return cached[0]
+
+        last_site_id = get_latest_bdu_id(headless=True)
+        if last_site_id and BDU_RE.match(last_site_id):
+            self._latest_bdu_cache = (last_site_id, time.monotonic())
+        return last_site_id
 
     def _validate_inputs(self) -> bool:
         use_fstek = self.use_fstek.get()
@@ -422,20 +496,18 @@ class UnifiedApp(tk.Tk):
         self._reset_progress_view(0)
         self.btn_start.configure(state=tk.DISABLED)
 
-        manager = mp.Manager()
-        self._status_q = manager.Queue()
-        self._progress_q = manager.Queue()
+        # mp.SimpleQueue (pipe + lock) вместо прокси Manager и mp.Queue:
+        # без серверного процесса и без фонового feeder-потока на каждого
+        # отправителя. Очередь создаётся один раз — к ней привязан пул
+        # воркеров (через initializer); статусы и прогресс идут в неё же
+        if self._status_q is None:
+            self._status_q = mp.SimpleQueue()
 
         threading.Thread(
-            target=self._status_listener,
+            target=self._queue_listener,
             args=(self._status_q,),
             daemon=True,
         ).start()
-        threading.Thread(
-            target=self._progress_listener,
-            args=(self._progress_q,),
-            daemon=True,
-        ).start()
 
         self._maybe_start_agent_api()
 
@@ -444,20 +516,52 @@ class UnifiedApp(tk.Tk):
 
         user_from = self.var_from.get().strip()
         user_to = self.var_to.get().strip()
+        user_range_ok = bool(BDU_RE.match(user_from) and BDU_RE.match(user_to))
+
+        def run_news() -> None:
+            try:
+                if self._status_q is not None:
+                    self._status_q.put('[Новости] Старт парсинга /vulnerability/latest')
+                df = scrape_latest(
+                    headless=True,
+                    status_q=self._status_q,
+                    progress_q=self._status_q,
+                )
+                if df is not None and not df.empty:
+                    inserted = insert_vulnerabilities(df, source='news')
+                    self._append_log(f'[Новости] Вставлено в БД записей: {inserted}\n')
+                else:
+                    self._append_log('[Новости] Новых уязвимостей не найдено.\n')
+            except Exception as e:
+                self._append_log(f'[Новости] Ошибка: {e}\n')
 
         def run_one() -> None:
+            executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+            latest_fut: Optional[concurrent.futures.Future] = None
             try:
+                if use_fstek and use_news:
+                    # оба источника: браузер ФСТЭК запрашивает последний BDU-ID,
+                    # пока идёт парсинг новостей; диапазон ФСТЭК — после новостей,
+                    # чтобы два прогона не делили одну шкалу прогресса
+                    self._append_log('[ФСТЭК] Определяю последнюю уязвимость на сайте...\n')
+                    executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+                    latest_fut = executor.submit(self._latest_site_bdu_id)
+                    run_news()
+
                 if use_fstek:
                     try:
-                        self._append_log('[ФСТЭК] Определяю последнюю уязвимость на сайте...\n')
-                        last_site_id = get_latest_bdu_id(headless=True)
+                        if latest_fut is not None:
+                            last_site_id = latest_fut.result()
+                        else:
+                            self._append_log('[ФСТЭК] Определяю последнюю уязвимость на сайте...\n')
+                            last_site_id = self._latest_site_bdu_id()
                         if not last_site_id or not BDU_RE.match(last_site_id):
                             self._append_log('[ФСТЭК] Не удалось получить корректный BDU-ID с сайта.\n')
                         else:
                             self._append_log(f'[ФСТЭК] Последний BDU-ID на сайте: {last_site_id}\n')
 
                             if user_from and user_to:
-                                if not (BDU_RE.match(user_from) and BDU_RE.match(user_to)):
+                                if not user_range_ok:
                                     self._append_log(
                                         '[ФСТЭК] Некорректный формат "от/до". Ожидается ГГГГ-НННН.\n',
                                     )
@@ -470,12 +574,12 @@ class UnifiedApp(tk.Tk):
                                     )
                                     self._run_fstek_range(start_id, end_id)
                             else:
-                                if self._bdu_id_exists_in_db(last_site_id):
+                                last_db_id, site_known = self._fstek_state(last_site_id)
+                                if site_known:
                                     self._append_log(
                                         f'[ФСТЭК] Новых уязвимостей нет: {last_site_id} уже есть в БД.\n',
                                     )
                                 else:
-                                    last_db_id = self._get_last_bdu_id_from_db()
                                     y_site, num_site_str, _ = self._parse_bdu_id(last_site_id)
 
                                     if last_db_id:
@@ -508,26 +612,15 @@ class UnifiedApp(tk.Tk):
                     except Exception as e:
                         self._append_log(f'[ФСТЭК] Ошибка: {e}\n')
 
-                if use_news:
-                    try:
-                        if self._status_q is not None:
-                            self._status_q.put('[Новости] Старт парсинга /vulnerability/latest')
-                        df = scrape_latest(
-                            headless=True,
-                            status_q=self._status_q,
-                            progress_q=self._progress_q,
-                        )
-                        if df is not None and not df.empty:
-                            inserted = insert_vulnerabilities(df, source='news')
-                            self._append_log(f'[Новости] Вставлено в БД записей: {inserted}\n')
-                        else:
-                            self._append_log('[Новости] Новых уязвимостей не найдено.\n')
-                    except Exception as e:
-                        self._append_log(f'[Новости] Ошибка: {e}\n')
+                if use_news and latest_fut is None:
+                    run_news()
 
             finally:
-                self._status_running = False
-                self._progress_finish()
+                if executor is not None:
+                    executor.shutdown(wait=False)
+                # слушатель блокируется на get() и завершается по сигналу
+                if self._status_q is not None:
+                    self._status_q.put(self._STOP)
                 # очистка диапазона после завершения всей работы
                 self.var_from.set('')
                 self.var_to.set('')
@@ -545,50 +638,44 @@ class UnifiedApp(tk.Tk):
 
         try:
             try:
-                ids = iter_ids(start_id, end_id)
-                total = len(ids)
+                total = count_ids(start_id, end_id)
             except Exception as e:
                 self._append_log(f'[ФСТЭК] Ошибка диапазона: {e}\n')
                 total = 0
 
-            if self._progress_q is not None and total > 0:
-                self._progress_q.put(('TOTAL', total))
+            if self._status_q is not None and total > 0:
+                self._status_q.put(('TOTAL', total))
 
-            workers = max(1, mp.cpu_count() // 2)
+            if self._pool is None:
+                self._pool = create_worker_pool(
+                    self._pool_size,
+                    progress_q=self._status_q,
+                    status_q=self._status_q,
+                )
             process_range_from_to(
                 start_id=start_id,
                 end_id=end_id,
-                workers=workers,
+                workers=self._pool_size,
                 friendly_order=None,
-                progress_q=self._progress_q,
+                progress_q=self._status_q,
                 status_q=self._status_q,
                 update_master_vuln=False,
                 update_master_reserved=False,
+                pool=self._pool,
             )
         except Exception as e:
             self._append_log(f'[ФСТЭК] Ошибка при обработке диапазона: {e}\n')
 
     def _load_settings(self) -> None:
         try:
-            if not self._settings_path.exists():
-                return
-            data = json.loads(self._settings_path.read_text(encoding='utf-8'))
+            with self._settings_path.open('rb') as f:
+                data = json.load(f)
         except Exception:
+            # нет файла или он битый — остаются значения по умолчанию
             return
-        
-    def _on_report_click(self) -> None:
-        """
-        Сформировать отчёт по БД (агенты + их ПО + уязвимости) в .docx.
-        """
-        try:
-            path = generate_vulnerability_report()
-        except Exception as exc:
-            messagebox.showerror('Ошибка', f'Не удалось сформировать отчёт:\n{exc}')
+        if not isinstance(data, dict):
             return
 
-        self._append_log(f'[Отчёт] Отчёт сформирован: {path}\n')
-        messagebox.showinfo('Отчёт', f'Отчёт сформирован:\n{path}')
-
         self.use_fstek.set(bool(data.get('use_fstek', self.use_fstek.get())))
         self.use_news.set(bool(data.get('use_news', self.use_news.get())))
 
@@ -603,7 +690,36 @@ class UnifiedApp(tk.Tk):
         self.agent_api_port.set(int(data.get('agent_api_port', self.agent_api_port.get())))
         self.private_key_path.set(str(data.get('private_key_path', self.private_key_path.get())))
 
+    def _on_report_click(self) -> None:
+        """
+        Сформировать отчёт по БД (агенты + их ПО + уязвимости) в .docx.
+        """
+        try:
+            path = generate_vulnerability_report()
+        except Exception as exc:
+            messagebox.showerror('Ошибка', f'Не удалось сформировать отчёт:\n{exc}')
+            return
+
+        self._append_log(f'[Отчёт] Отчёт сформирован: {path}\n')
+        messagebox.showinfo('Отчёт', f'Отчёт сформирован:\n{path}')
+
+    def _persisted_vars(self) -> tuple[tk.Variable, ...]:
+        return (
+            self.use_fstek,
+            self.use_news,
+            self.var_fstek_hours,
+            self.var_news_hours,
+            self.agent_api_enabled,
+            self.agent_api_port,
+            self.private_key_path,
+        )
+
+    def _mark_settings_dirty(self, *_args: object) -> None:
+        self._settings_dirty = True
+
     def _save_settings(self) -> None:
+        if not self._settings_dirty:
+            return
         data = {
             'use_fstek': bool(self.use_fstek.get()),
             'use_news': bool(self.use_news.get()),
@@ -613,24 +729,47 @@ class UnifiedApp(tk.Tk):
             'agent_api_port': int(self.agent_api_port.get() or 8000),
             'private_key_path': self.private_key_path.get(),
         }
+        # запись во временный файл + os.replace: при сбое посреди записи
+        # старый app_settings.json остаётся целым
+        tmp = self._settings_path.with_suffix('.tmp')
         try:
-            self._settings_path.write_text(
+            tmp.write_text(
                 json.dumps(data, ensure_ascii=False, indent=2),
                 encoding='utf-8',
             )
+            os.replace(tmp, self._settings_path)
+            self._settings_dirty = False
         except Exception:
             pass
 
     def _on_close(self) -> None:
         self._save_settings()
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+        try:
+            self._db.close()
+        except Exception:
+            pass
         self.destroy()
 
 
 def main() -> None:
     mp.freeze_support()
+    # Пул воркеров создаётся лениво из потока запуска, когда уже работают
+    # Tk, слушатель очереди, waitress и QueueListener логов. fork в такой
+    # момент копирует в воркеры слушающий сокет API и блокировки, которые
+    # другой поток держит (обработчик логов, мьютекс очереди). Поэтому вне
+    # Windows — forkserver: процессы порождает отдельный однопоточный сервер,
+    # а preload импортирует модули воркера в нём один раз, а не в каждом
+    # процессе. На Windows есть только spawn.
     try:
-        mp.set_start_method('spawn', force=True)
-    except RuntimeError:
+        if sys.platform == 'win32':
+            mp.set_start_method('spawn', force=True)
+        else:
+            mp.set_start_method('forkserver', force=True)
+            mp.set_forkserver_preload(['src.processing'])
+    except (RuntimeError, ValueError):
         pass
     app = UnifiedApp()
     app.mainloop()
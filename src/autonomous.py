@@ -1,6 +1,7 @@
 from __future__ import annotations
 
-import time
+import threading
+import concurrent.futures
 import multiprocessing as mp
 from typing import Optional, List
 
@@ -17,61 +18,77 @@ def autonomous_loop(
     update_master_vuln: bool,
     update_master_reserved: bool,
     status_q: Optional[mp.Queue] = None,
+    stop_event: Optional[threading.Event] = None,
 ) -> None:
+    if stop_event is None:
+        stop_event = threading.Event()
+
     def emit(msg: str) -> None:
         if status_q is None:
             return
         try:
-            status_q.put(msg, block=False)
+            status_q.put(msg)
         except Exception:
             pass
 
     emit(f'[*] Автоматический режим: каждые {interval_hours} ч проверяем обновления.')
 
-    while True:
-        try:
-            news = get_latest_from_news_count(headless=True)
-            news_url = news.get('news_url')
-            count = news.get('count') or 0
+    # верхняя новость и последний BDU-ID — два независимых запуска браузера.
+    # BDU-ID запрашиваем заранее, одновременно с новостью: нужен он только
+    # если новость новая, но тогда ждать второй браузер не приходится.
+    # Если новость та же, результат (и ошибка) запроса BDU-ID не используются —
+    # за это платим лишним запуском браузера в каждом цикле
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+    try:
+        while True:
+            try:
+                news_fut = executor.submit(get_latest_from_news_count, headless=True)
+                latest_fut = executor.submit(get_latest_bdu_id, headless=True)
+                news = news_fut.result()
+                news_url = news.get('news_url')
+                count = news.get('count') or 0
 
-            if not news_url or count <= 0:
-                emit('[WARN] Верхняя новость не распознана. Повторим позже.')
-            else:
-                stamp = RESULTS_DIR / 'last_seen_news.txt'
-                last_seen = stamp.read_text(encoding='utf-8').strip() if stamp.exists() else None
+                if not news_url or count <= 0:
+                    emit('[WARN] Верхняя новость не распознана. Повторим позже.')
+                else:
+                    stamp = RESULTS_DIR / 'last_seen_news.txt'
+                    last_seen = stamp.read_text(encoding='utf-8').strip() if stamp.exists() else None
 
-                if last_seen != news_url:
-                    latest = get_latest_bdu_id(headless=True)
-                    first = subtract_steps(latest, count - 1)
-                    emit(
-                        f'[*] Новое обновление! {news_url}\n'
-                        f'    Диапазон: {first} … {latest} (count={count})'
-                    )
+                    if last_seen != news_url:
+                        latest = latest_fut.result()
+                        first = subtract_steps(latest, count - 1)
+                        emit(
+                            f'[*] Новое обновление! {news_url}\n'
+                            f'    Диапазон: {first} … {latest} (count={count})'
+                        )
 
-                    process_range_from_to(
-                        first,
-                        latest,
-                        workers,
-                        friendly_order,
-                        progress_q=None,
-                        status_q=status_q,
-                        update_master_vuln=update_master_vuln,
-                        update_master_reserved=update_master_reserved,
-                    )
+                        process_range_from_to(
+                            first,
+                            latest,
+                            workers,
+                            friendly_order,
+                            progress_q=None,
+                            status_q=status_q,
+                            update_master_vuln=update_master_vuln,
+                            update_master_reserved=update_master_reserved,
+                        )
 
-                    stamp.write_text(news_url, encoding='utf-8')
-                else:
-                    emit('[*] Новостей нет.')
-        except KeyboardInterrupt:
-            emit('[!] Остановка авто режима')
-            break
-        except Exception as e:
-            emit(f'[WARN] Ошибка авто цикла: {e}')
+                        stamp.write_text(news_url, encoding='utf-8')
+                    else:
+                        emit('[*] Новостей нет.')
+            except KeyboardInterrupt:
+                emit('[!] Остановка авто режима')
+                break
+            except Exception as e:
+                emit(f'[WARN] Ошибка авто цикла: {e}')
 
-        try:
-            minutes = max(1, int(interval_hours)) * 60
-            for _ in range(minutes):
-                time.sleep(60)
-        except KeyboardInterrupt:
-            emit('[!] Остановка авто режима')
-            break
+            # одно ожидание до следующей проверки; stop_event.set() прерывает его сразу
+            try:
+                if stop_event.wait(timeout=max(1, int(interval_hours)) * 3600):
+                    emit('[!] Остановка авто режима')
+                    break
+            except KeyboardInterrupt:
+                emit('[!] Остановка авто режима')
+                break
+    finally:
+        executor.shutdown(wait=False)
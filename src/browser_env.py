@@ -2,41 +2,88 @@
 from __future__ import annotations
 
 from pathlib import Path
-from typing import Optional, Tuple, List
-import fnmatch
+from typing import Optional, Tuple, Dict
+import os
 
 from config import BROWSER_DIR
 
-# ---- Файловые паттерны ----
-_CHROME_PATTERNS: List[str] = ['chrome.exe', 'chrome*.exe', 'chromium*.exe']
-_CHROMEDRIVER_PATTERNS: List[str] = ['chromedriver.exe', 'chromedriver*.exe']
-
 # Для Chrome for Testing рядом с chrome.exe должны лежать эти файлы + каталог locales/
 _REQUIRED_NEIGHBORS = ['chrome.dll', 'icudtl.dat']
 
 
+# Найденные пары (chrome, chromedriver) по корню поиска — на время процесса.
+# Кэшируются только полные находки: если папку browser/ докладывают позже,
+# следующий вызов её увидит.
+_BINARIES_CACHE: Dict[str, Tuple[str, str]] = {}
+
+
 # ===================== ФАЙЛОВЫЙ ПОИСК =====================
 
-def _iter_files_recursive(root: Path) -> list[Path]:
-    files: list[Path] = []
-    try:
-        for p in root.rglob('*'):
-            if p.is_file():
-                files.append(p)
-    except Exception:
-        # на случай проблем с правами/симлинками и т.п.
-        pass
-    return files
-
-
-def _match_first(files: list[Path], patterns: list[str]) -> Optional[Path]:
-    for pat in patterns:
-        for f in files:
-            if fnmatch.fnmatch(f.name.lower(), pat.lower()):
-                return f
+def _chrome_rank(name: str) -> Optional[int]:
+    """
+    Приоритет имени как браузера (меньше — лучше):
+    chrome.exe → chrome*.exe (кроме chromedriver) → chromium*.exe.
+    """
+    if not name.endswith('.exe'):
+        return None
+    if name == 'chrome.exe':
+        return 0
+    if name.startswith('chromedriver'):
+        return None
+    if name.startswith('chromium'):
+        return 2
+    if name.startswith('chrome'):
+        return 1
     return None
 
 
+def _chromedriver_rank(name: str) -> Optional[int]:
+    # chromedriver.exe → chromedriver*.exe
+    if not name.endswith('.exe') or not name.startswith('chromedriver'):
+        return None
+    return 0 if name == 'chromedriver.exe' else 1
+
+
+def _scan_binaries(root: str) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Обход дерева через os.scandir (без Path на каждый файл и без fnmatch).
+    Останавливается, как только найдены точные chrome.exe и chromedriver.exe;
+    иначе возвращает лучшие по приоритету совпадения.
+    """
+    chrome: Optional[Tuple[int, str]] = None
+    cdrv: Optional[Tuple[int, str]] = None
+    stack = [root]
+    while stack:
+        try:
+            it = os.scandir(stack.pop())
+        except OSError:
+            # на случай проблем с правами/симлинками и т.п.
+            continue
+        with it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                        continue
+                    if not entry.is_file():
+                        continue
+                except OSError:
+                    continue
+
+                name = entry.name.lower()
+                rank = _chrome_rank(name)
+                if rank is not None and (chrome is None or rank < chrome[0]):
+                    chrome = (rank, entry.path)
+                rank = _chromedriver_rank(name)
+                if rank is not None and (cdrv is None or rank < cdrv[0]):
+                    cdrv = (rank, entry.path)
+
+                if chrome and cdrv and chrome[0] == 0 and cdrv[0] == 0:
+                    return chrome[1], cdrv[1]
+
+    return (chrome[1] if chrome else None), (cdrv[1] if cdrv else None)
+
+
 # ===================== ЗАГЛУШКИ ДЛЯ EDGE (СОВМЕСТИМОСТЬ) =====================
 
 def find_edge_driver(root: Optional[Path] = None) -> Optional[Path]:
@@ -69,10 +116,23 @@ def find_chrome_binaries(root: Optional[Path] = None) -> Tuple[Optional[Path], O
     if not root_path.exists():
         return None, None
 
-    files = _iter_files_recursive(root_path)
-    chrome = _match_first(files, _CHROME_PATTERNS)
-    chromedriver = _match_first(files, _CHROMEDRIVER_PATTERNS)
-    return chrome, chromedriver
+    key = str(root_path)
+    cached = _BINARIES_CACHE.get(key)
+    if cached is not None:
+        chrome, chromedriver = cached
+    else:
+        chrome, chromedriver = _scan_binaries(key)
+        if chrome and chromedriver:
+            _BINARIES_CACHE[key] = (chrome, chromedriver)
+    return (
+        Path(chrome) if chrome else None,
+        Path(chromedriver) if chromedriver else None,
+    )
+
+
+def invalidate_browser_cache() -> None:
+    """Сбросить кэш find_chrome_binaries (например, после замены сборки браузера)."""
+    _BINARIES_CACHE.clear()
 
 
 def _has_required_neighbors(chrome_path: Path) -> bool:
@@ -1,23 +1,21 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
 
-from pathlib import Path
-from typing import Optional, Any, List, Dict
+from typing import Optional, Any, Iterator, List, Sequence, Tuple
 from datetime import datetime
-import sys
+import os
 import sqlite3
+import threading
 import re
+import functools
+import itertools
 
 import pandas as pd
 
-try:
-    from config import RESULTS_DIR  # type: ignore[attr-defined]
-except Exception:
-    ROOT_DIR = Path(getattr(sys, '_MEIPASS', Path(__file__).resolve().parent)).resolve()
-    RESULTS_DIR = ROOT_DIR / 'results'
-    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+from src.paths import DB_PATH
 
-DB_PATH = RESULTS_DIR / 'vuln.db'
+# (name, version, publisher) — строка ПО агента в порядке колонок agent_software
+SoftwareRow = Tuple[str, Optional[str], Optional[str]]
 
 DESIRED_COLUMNS = [
     'id',
@@ -37,11 +35,49 @@ DESIRED_COLUMNS = [
 ]
 
 
-def _get_connection() -> sqlite3.Connection:
+def _get_connection(check_same_thread: bool = True) -> sqlite3.Connection:
     DB_PATH.parent.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
+    conn = sqlite3.connect(DB_PATH, check_same_thread=check_same_thread)
     conn.execute('PRAGMA journal_mode=WAL;')
     conn.execute('PRAGMA synchronous=NORMAL;')
+    # чтение через mmap (до 256 МБ) вместо read(), кэш страниц ~16 МБ,
+    # временные B-деревья (ORDER BY / GROUP BY) — в памяти
+    conn.execute('PRAGMA mmap_size=268435456;')
+    conn.execute('PRAGMA cache_size=-16000;')
+    conn.execute('PRAGMA temp_store=MEMORY;')
+    return conn
+
+
+# соединение для коротких чтений (url_exists, urls_existing, fetch_all) — одно на поток
+# и процесс, вместо connect + PRAGMA на каждый вызов.
+# Короткие потоки (run_one на каждый «Старт», потоки карточек sv_latest) не
+# копят соединения: при завершении потока его threading.local очищается,
+# и sqlite3.Connection закрывается при удалении. Долгие потоки (GUI, API)
+# держат одно соединение — ради этого кэш и нужен
+_READER = threading.local()
+
+
+def _reader_connection() -> sqlite3.Connection:
+    conn = getattr(_READER, 'conn', None)
+    # после fork у дочернего процесса должен быть свой дескриптор
+    if conn is None or getattr(_READER, 'pid', None) != os.getpid():
+        conn = _get_connection()
+        # только SELECT — без неявных транзакций
+        conn.isolation_level = None
+        _READER.conn = conn
+        _READER.pid = os.getpid()
+    return conn
+
+
+def open_connection(check_same_thread: bool = True) -> sqlite3.Connection:
+    """
+    Долгоживущее соединение для вызывающего кода (GUI и т.п.),
+    чтобы не открывать файл БД на каждый запрос.
+    Кэш страниц чуть больше (~20 МБ) — он окупается как раз
+    на долгоживущем соединении.
+    """
+    conn = _get_connection(check_same_thread=check_same_thread)
+    conn.execute('PRAGMA cache_size=-20000;')
     return conn
 
 
@@ -67,7 +103,7 @@ def _create_fresh_schema(conn: sqlite3.Connection) -> None:
 
         CREATE INDEX IF NOT EXISTS idx_vuln_source ON vulnerabilities(source);
         CREATE INDEX IF NOT EXISTS idx_vuln_cve    ON vulnerabilities(cve);
-        CREATE INDEX IF NOT EXISTS idx_vuln_url    ON vulnerabilities(url);
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_vuln_url_source ON vulnerabilities(url, source);
         '''
     )
     conn.commit()
@@ -81,6 +117,14 @@ def _table_exists(conn: sqlite3.Connection, name: str) -> bool:
     return cur.fetchone() is not None
 
 
+def _index_exists(conn: sqlite3.Connection, name: str) -> bool:
+    cur = conn.execute(
+        'SELECT name FROM sqlite_master WHERE type="index" AND name=?',
+        (name,),
+    )
+    return cur.fetchone() is not None
+
+
 def _get_existing_columns(conn: sqlite3.Connection) -> List[str]:
     cur = conn.execute('PRAGMA table_info(vulnerabilities)')
     return [row[1] for row in cur.fetchall()]
@@ -138,10 +182,11 @@ def _migrate_old_schema(conn: sqlite3.Connection, existing_cols: List[str]) -> N
     else:
         select_parts.append('NULL AS created_date')
 
-    select_sql = 'SELECT ' + ', '.join(select_parts) + ' FROM vulnerabilities_old;'
+    select_sql = 'SELECT ' + ', '.join(select_parts) + ' FROM vulnerabilities_old ORDER BY id;'
 
+    # OR IGNORE: дубли (url, source) из старой таблицы не пройдут уникальный индекс
     insert_sql = '''
-        INSERT INTO vulnerabilities
+        INSERT OR IGNORE INTO vulnerabilities
             (id, source, bdu_id, cve, cvss, severity,
              vendor, product, type, title, url,
              publication_date, raw_date, created_date)
@@ -153,6 +198,44 @@ def _migrate_old_schema(conn: sqlite3.Connection, existing_cols: List[str]) -> N
     conn.commit()
 
 
+def _ensure_vuln_indexes(conn: sqlite3.Connection) -> None:
+    """
+    Индексы, которые нужны и старым базам (создаются без миграции).
+    (source, bdu_id) — покрывающий индекс для поиска последнего/наличия BDU-ID.
+    (url, source) — уникальный: повторная вставка той же записи игнорируется.
+    (source) — неявно (source, rowid): выборка источника в порядке id DESC
+    идёт по индексу без сортировки. После миграции схемы он мог пропасть
+    (индексы уходят вместе с переименованной старой таблицей).
+    """
+    conn.execute(
+        'CREATE INDEX IF NOT EXISTS idx_vuln_source_bduid '
+        'ON vulnerabilities(source, bdu_id)'
+    )
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_vuln_source ON vulnerabilities(source)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_vuln_cve ON vulnerabilities(cve)')
+
+    if not _index_exists(conn, 'idx_vuln_url_source'):
+        # в старых базах повторные прогоны могли оставить дубли — оставляем
+        # самую раннюю запись (как и INSERT OR IGNORE); строки без url не трогаем
+        conn.execute(
+            '''
+            DELETE FROM vulnerabilities
+            WHERE url IS NOT NULL
+              AND id NOT IN (
+                  SELECT MIN(id) FROM vulnerabilities
+                  WHERE url IS NOT NULL
+                  GROUP BY url, source
+              )
+            '''
+        )
+        conn.execute(
+            'CREATE UNIQUE INDEX IF NOT EXISTS idx_vuln_url_source '
+            'ON vulnerabilities(url, source)'
+        )
+    # префикс (url) уникального индекса заменяет прежний idx_vuln_url
+    conn.execute('DROP INDEX IF EXISTS idx_vuln_url')
+
+
 def _ensure_agent_schema(conn: sqlite3.Connection) -> None:
     """
     Создание (при необходимости) таблиц для агентов и их ПО.
@@ -168,10 +251,15 @@ def _ensure_agent_schema(conn: sqlite3.Connection) -> None:
             architecture TEXT,
             ip_address  TEXT,
             first_seen  TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            last_seen   TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            last_seen   TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            software_digest BLOB
         )
         '''
     )
+    # БД, созданные до появления отпечатка списка ПО
+    agent_cols = {row[1] for row in conn.execute('PRAGMA table_info(agents)')}
+    if 'software_digest' not in agent_cols:
+        conn.execute('ALTER TABLE agents ADD COLUMN software_digest BLOB')
 
     conn.execute(
         '''
@@ -196,7 +284,15 @@ def _ensure_agent_schema(conn: sqlite3.Connection) -> None:
     )
 
 
+# схема проверяется/мигрирует один раз на процесс; дальше init_db() — no-op
+_INITIALIZED = False
+
+
 def init_db() -> None:
+    global _INITIALIZED
+    if _INITIALIZED:
+        return
+
     conn = _get_connection()
     try:
         if not _table_exists(conn, 'vulnerabilities'):
@@ -205,12 +301,20 @@ def init_db() -> None:
             existing = _get_existing_columns(conn)
             _migrate_old_schema(conn, existing)
 
+        _ensure_vuln_indexes(conn)
         _ensure_agent_schema(conn)
         conn.commit()
+        _INITIALIZED = True
     finally:
         conn.close()
 
 
+def reset_schema_check() -> None:
+    """Следующий init_db() снова проверит схему (например, после замены файла БД)."""
+    global _INITIALIZED
+    _INITIALIZED = False
+
+
 def _strip_vendor_from_product(prod: Any, vend: Any) -> Any:
     if prod is None or vend is None:
         return prod
@@ -223,139 +327,148 @@ def _strip_vendor_from_product(prod: Any, vend: Any) -> Any:
     if s.lower().startswith((v + ',').lower()):
         return s[len(v):].lstrip(' ,\u00A0-')
 
-    pattern = r'^\s*' + re.escape(v) + r'[\s,\u00A0\-]+'
-    cleaned = re.sub(pattern, '', s, flags=re.IGNORECASE).strip()
+    cleaned = _vendor_prefix_re(v).sub('', s).strip()
     return cleaned or s
 
 
+@functools.lru_cache(maxsize=1024)
+def _vendor_prefix_re(vendor: str) -> re.Pattern:
+    # вендоров в пачке единицы-десятки, строк — тысячи: шаблон собираем один раз на вендора
+    return re.compile(r'^\s*' + re.escape(vendor) + r'[\s,\u00A0\-]+', re.IGNORECASE)
+
+
 def url_exists(url: str, source: Optional[str] = None) -> bool:
     if not url:
         return False
     init_db()
-    conn = _get_connection()
-    try:
+    conn = _reader_connection()
+    if source:
+        cur = conn.execute(
+            'SELECT 1 FROM vulnerabilities WHERE url = ? AND source = ? LIMIT 1',
+            (url, source),
+        )
+    else:
+        cur = conn.execute(
+            'SELECT 1 FROM vulnerabilities WHERE url = ? LIMIT 1',
+            (url,),
+        )
+    return cur.fetchone() is not None
+
+
+# лимит SQLITE_MAX_VARIABLE_NUMBER в старых сборках — 999 параметров
+_URL_BATCH = 500
+
+
+def urls_existing(urls: Sequence[str], source: Optional[str] = None) -> set[str]:
+    """
+    Какие из переданных url уже есть в БД (опционально — у одного источника).
+    Запросы WHERE url IN (...) пачками по _URL_BATCH идут по индексу
+    idx_vuln_url_source — из таблицы читаются только эти url, а не все.
+    """
+    wanted = [u for u in dict.fromkeys(urls) if u]
+    if not wanted:
+        return set()
+    init_db()
+    conn = _reader_connection()
+    found: set[str] = set()
+    for start in range(0, len(wanted), _URL_BATCH):
+        batch = wanted[start:start + _URL_BATCH]
+        marks = ', '.join('?' * len(batch))
         if source:
             cur = conn.execute(
-                'SELECT 1 FROM vulnerabilities WHERE url = ? AND source = ? LIMIT 1',
-                (url, source),
+                f'SELECT url FROM vulnerabilities WHERE source = ? AND url IN ({marks})',
+                (source, *batch),
             )
         else:
             cur = conn.execute(
-                'SELECT 1 FROM vulnerabilities WHERE url = ? LIMIT 1',
-                (url,),
+                f'SELECT url FROM vulnerabilities WHERE url IN ({marks})',
+                batch,
             )
-        return cur.fetchone() is not None
-    finally:
-        conn.close()
+        found.update(row[0] for row in cur)
+    return found
+
+
+# дубли по (url, source) отсекает уникальный индекс idx_vuln_url_source
+_INSERT_VULN_SQL = '''
+    INSERT OR IGNORE INTO vulnerabilities
+        (source, bdu_id, cve, cvss, severity,
+         vendor, product, type, title, url,
+         publication_date, raw_date, created_date)
+    VALUES
+        (?, ?, ?, ?, ?,
+         ?, ?, ?, ?, ?,
+         ?, ?, ?)
+'''
 
 
 def insert_vulnerabilities(df: pd.DataFrame, source: str, bdu_id: Optional[str] = None) -> int:
     if df is None or df.empty:
         return 0
 
-    df = df.copy()
-
+    # служебные флаги отсекаем одной маской, без копий и drop: дальше колонки
+    # только читаются, а should_skip/should_stop в INSERT не попадают
+    mask = None
     for tech_col in ('should_skip', 'should_stop'):
         if tech_col in df.columns:
-            df = df[df[tech_col] != True].drop(columns=[tech_col])  # noqa: E712
+            keep = df[tech_col] != True  # noqa: E712
+            mask = keep if mask is None else (mask & keep)
+    if mask is not None:
+        df = df.loc[mask]
 
     if df.empty:
         return 0
 
-    cols = df.columns
-
-    def col(name: str) -> Optional[pd.Series]:
-        return df[name] if name in cols else None
-
-    cve_col = col('CVE')
-    cvss_col = col('CVSS')
-    prod_col = col('Продукт')
-    vend_col = col('Вендор')
-    type_col = col('Тип')
-    title_col = col('Заголовок')
-    url_col = col('Источник')
-    date_col = col('Дата')
-    pub_news = col('Опубликовано')
-    pub_bdu = col('Дата публикации')
-    det_bdu = col('Дата выявления')
-    sev_col = col('Критичность')
-
-    bdu_col: Optional[pd.Series] = None
-    for name in ('BDU-ID', 'BDU_ID'):
-        if name in cols:
-            bdu_col = df[name]
-            break
-
-    records: List[Dict[str, Any]] = []
     n = len(df)
+    cols = df.columns
 
-    for i in range(n):
-        if pub_news is not None and i < len(pub_news):
-            publication_val = pub_news.iloc[i]
-        elif pub_bdu is not None and i < len(pub_bdu):
-            publication_val = pub_bdu.iloc[i]
-        elif date_col is not None and i < len(date_col):
-            publication_val = date_col.iloc[i]
-        else:
-            publication_val = None
-
-        if det_bdu is not None and i < len(det_bdu):
-            raw_date_val = det_bdu.iloc[i]
-        elif date_col is not None and i < len(date_col):
-            raw_date_val = date_col.iloc[i]
-        else:
-            raw_date_val = None
-
-        if bdu_col is not None and i < len(bdu_col):
-            bdu_val = bdu_col.iloc[i]
-        else:
-            bdu_val = bdu_id
-
-        vend_val = vend_col.iloc[i] if vend_col is not None and i < len(vend_col) else None
-        prod_val = prod_col.iloc[i] if prod_col is not None and i < len(prod_col) else None
-        prod_val = _strip_vendor_from_product(prod_val, vend_val)
-
-        created_date_val = datetime.now().strftime('%d.%m.%Y')
-
-        records.append(
-            {
-                'source': source,
-                'bdu_id': bdu_val,
-                'cve': cve_col.iloc[i] if cve_col is not None and i < len(cve_col) else None,
-                'cvss': cvss_col.iloc[i] if cvss_col is not None and i < len(cvss_col) else None,
-                'severity': sev_col.iloc[i] if sev_col is not None and i < len(sev_col) else None,
-                'vendor': vend_val,
-                'product': prod_val,
-                'type': type_col.iloc[i] if type_col is not None and i < len(type_col) else None,
-                'title': title_col.iloc[i] if title_col is not None and i < len(title_col) else None,
-                'url': url_col.iloc[i] if url_col is not None and i < len(url_col) else None,
-                'publication_date': publication_val,
-                'raw_date': raw_date_val,
-                'created_date': created_date_val,
-            }
-        )
+    def values(*names: str, default: Any = None) -> List[Any]:
+        # колонка целиком в python-значения (tolist), первая из имеющихся
+        for name in names:
+            if name in cols:
+                return df[name].tolist()
+        return [default] * n
+
+    vendors = values('Вендор')
+    products = [
+        _strip_vendor_from_product(prod, vend)
+        for prod, vend in zip(values('Продукт'), vendors)
+    ]
+    created_date = datetime.now().strftime('%d.%m.%Y')
+
+    # кортежи строк отдаются executemany лениво (zip), без промежуточного списка;
+    # source и created_date одинаковы для всей пачки — repeat вместо [x] * n
+    records = zip(
+        itertools.repeat(source),
+        values('BDU-ID', 'BDU_ID', default=bdu_id),
+        values('CVE'),
+        values('CVSS'),
+        values('Критичность'),
+        vendors,
+        products,
+        values('Тип'),
+        values('Заголовок'),
+        values('Источник'),
+        values('Опубликовано', 'Дата публикации', 'Дата'),
+        values('Дата выявления', 'Дата'),
+        itertools.repeat(created_date),
+    )
 
     init_db()
     conn = _get_connection()
     try:
-        conn.executemany(
-            '''
-            INSERT INTO vulnerabilities
-                (source, bdu_id, cve, cvss, severity,
-                 vendor, product, type, title, url,
-                 publication_date, raw_date, created_date)
-            VALUES
-                (:source, :bdu_id, :cve, :cvss, :severity,
-                 :vendor, :product, :type, :title, :url,
-                 :publication_date, :raw_date, :created_date)
-            ''',
-            records,
-        )
-        conn.commit()
+        # одна транзакция на всю пачку: commit при выходе, rollback при ошибке.
+        # BEGIN IMMEDIATE сразу берёт блокировку на запись — без повышения
+        # shared → reserved посреди пачки, когда пишут несколько процессов
+        before = conn.total_changes
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.executemany(_INSERT_VULN_SQL, records)
+        # сколько строк реально добавлено (без проигнорированных дублей)
+        inserted = conn.total_changes - before
     finally:
         conn.close()
 
-    return len(records)
+    return inserted
 
 
 def upsert_agent_inventory(
@@ -366,80 +479,161 @@ def upsert_agent_inventory(
     os_version: Optional[str],
     architecture: Optional[str],
     ip_address: Optional[str],
-    software_list: List[Dict[str, Any]],
+    software_rows: List[SoftwareRow],
+    software_digest: Optional[bytes] = None,
 ) -> None:
     """
     Обновление информации об агенте и его ПО.
     ОС + IP идут в таблицу agents, ПО — в agent_software.
+    software_rows — уже нормализованные кортежи (name, version, publisher).
+    software_digest — отпечаток списка ПО. Если он совпал с сохранённым
+    в agents, список не изменился: строки agent_software не пересобираем,
+    только обновляем у них last_seen. Сравнение и запись идут в одной
+    транзакции BEGIN IMMEDIATE, поэтому параллельные отчёты одного агента
+    не оставят в БД один список ПО, а в отпечатке — другой.
+    None — отпечатка нет, список ПО синхронизируется всегда.
     """
     init_db()
     conn = _get_connection()
     try:
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            stored = conn.execute(
+                'SELECT software_digest FROM agents WHERE agent_id = ?',
+                (agent_id,),
+            ).fetchone()
+            software_changed = (
+                software_digest is None
+                or stored is None
+                or stored[0] != software_digest
+            )
+            conn.execute(
+                '''
+                INSERT INTO agents (
+                    agent_id, hostname, os_type, os_release,
+                    os_version, architecture, ip_address, software_digest
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(agent_id) DO UPDATE SET
+                    hostname     = excluded.hostname,
+                    os_type      = excluded.os_type,
+                    os_release   = excluded.os_release,
+                    os_version   = excluded.os_version,
+                    architecture = excluded.architecture,
+                    ip_address   = excluded.ip_address,
+                    software_digest = excluded.software_digest,
+                    last_seen    = CURRENT_TIMESTAMP
+                ''',
+                (
+                    agent_id,
+                    hostname,
+                    os_type,
+                    os_release,
+                    os_version,
+                    architecture,
+                    ip_address,
+                    software_digest,
+                ),
+            )
+
+            if software_changed:
+                _sync_agent_software(conn, agent_id, software_rows)
+            else:
+                conn.execute(
+                    'UPDATE agent_software SET last_seen = ? WHERE agent_id = ?',
+                    (datetime.utcnow().isoformat(timespec='seconds'), agent_id),
+                )
+    finally:
+        conn.close()
+
+
+def _sync_agent_software(
+    conn: sqlite3.Connection,
+    agent_id: str,
+    software_rows: List[SoftwareRow],
+) -> None:
+    """
+    Приводит agent_software агента к software_rows по разнице, а не DELETE всего + INSERT:
+    удаляются только исчезнувшие строки, добавляются только новые, у остальных
+    first_seen сохраняется, а last_seen обновляется.
+    Ключ — (name, version, publisher): одно ПО может стоять в нескольких версиях.
+    """
+    now = datetime.utcnow().isoformat(timespec='seconds')
+    wanted = dict.fromkeys(software_rows)  # без дублей, порядок сохраняется
+
+    stale_ids: List[Tuple[int]] = []
+    present: set = set()
+    for row_id, name, version, publisher in conn.execute(
+        'SELECT id, name, version, publisher FROM agent_software WHERE agent_id = ?',
+        (agent_id,),
+    ):
+        key = (name, version, publisher)
+        if key in wanted and key not in present:
+            present.add(key)
+        else:
+            stale_ids.append((row_id,))
+
+    if stale_ids:
+        conn.executemany('DELETE FROM agent_software WHERE id = ?', stale_ids)
+
+    if present:
         conn.execute(
+            'UPDATE agent_software SET last_seen = ? WHERE agent_id = ?',
+            (now, agent_id),
+        )
+
+    new_rows = [
+        (agent_id, name, version, publisher, now, now)
+        for name, version, publisher in wanted
+        if (name, version, publisher) not in present
+    ]
+    if new_rows:
+        # все новые строки уходят одним executemany в той же транзакции
+        conn.executemany(
             '''
-            INSERT INTO agents (
-                agent_id, hostname, os_type, os_release,
-                os_version, architecture, ip_address
+            INSERT INTO agent_software (
+                agent_id, name, version, publisher, first_seen, last_seen
             )
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-            ON CONFLICT(agent_id) DO UPDATE SET
-                hostname     = excluded.hostname,
-                os_type      = excluded.os_type,
-                os_release   = excluded.os_release,
-                os_version   = excluded.os_version,
-                architecture = excluded.architecture,
-                ip_address   = excluded.ip_address,
-                last_seen    = CURRENT_TIMESTAMP
+            VALUES (?, ?, ?, ?, ?, ?)
             ''',
-            (
-                agent_id,
-                hostname,
-                os_type,
-                os_release,
-                os_version,
-                architecture,
-                ip_address,
-            ),
+            new_rows,
         )
 
-        # простая стратегия: удаляем старый список ПО и пишем новый
-        conn.execute('DELETE FROM agent_software WHERE agent_id = ?', (agent_id,))
-
-        if software_list:
-            now = datetime.utcnow().isoformat(timespec='seconds')
-            rows: List[tuple] = []
-            for item in software_list:
-                name = (item.get('name') or '').strip()
-                if not name:
-                    continue
-                version = (item.get('version') or '').strip() or None
-                publisher = (item.get('publisher') or '').strip() or None
-                rows.append((agent_id, name, version, publisher, now, now))
-
-            if rows:
-                conn.executemany(
-                    '''
-                    INSERT INTO agent_software (
-                        agent_id, name, version, publisher, first_seen, last_seen
-                    )
-                    VALUES (?, ?, ?, ?, ?, ?)
-                    ''',
-                    rows,
-                )
 
-        conn.commit()
-    finally:
-        conn.close()
+def _select_all_sql(limit: Optional[int], source: Optional[str]) -> Tuple[str, Tuple[Any, ...]]:
+    query = 'SELECT * FROM vulnerabilities'
+    params: Tuple[Any, ...] = ()
+    if source:
+        # WHERE source = ? ORDER BY id DESC — обход idx_vuln_source, без сортировки
+        query += ' WHERE source = ?'
+        params += (source,)
+    query += ' ORDER BY id DESC'
+    if limit is not None:
+        query += ' LIMIT ?'
+        params += (int(limit),)
+    return query, params
+
+
+def fetch_all(limit: Optional[int] = None, source: Optional[str] = None) -> pd.DataFrame:
+    init_db()
+    query, params = _select_all_sql(limit, source)
+    return pd.read_sql_query(query, _reader_connection(), params=params)
 
 
-def fetch_all(limit: Optional[int] = None) -> pd.DataFrame:
+def iter_vulnerabilities(
+    chunksize: int = 5000,
+    limit: Optional[int] = None,
+    source: Optional[str] = None,
+) -> Iterator[pd.DataFrame]:
+    """
+    То же, что fetch_all, но порциями по chunksize строк:
+    для больших БД в памяти держится одна порция, а не вся таблица.
+    """
     init_db()
     conn = _get_connection()
     try:
-        query = 'SELECT * FROM vulnerabilities ORDER BY id DESC'
-        if limit is not None:
-            query += f' LIMIT {int(limit)}'
-        df = pd.read_sql_query(query, conn)
+        query, params = _select_all_sql(limit, source)
+        for chunk in pd.read_sql_query(query, conn, params=params, chunksize=chunksize):
+            yield chunk
     finally:
         conn.close()
-    return df
@@ -9,11 +9,19 @@ from typing import Optional, List
 from selenium.webdriver import Chrome
 from selenium.webdriver.chrome.service import Service as ChromeService
 from selenium.webdriver.chrome.options import Options as ChromeOptions
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import TimeoutException
 
 from src.exceptions import DriverNotFoundError, PageLoadError, PageNotFoundError
 from src.browser_env import find_chrome_binaries
 from config import EDGE_UA
 
+_PRE_RE = re.compile(r'<pre[^>]*>(.*?)</pre>', re.IGNORECASE | re.DOTALL)
+_TAG_RE = re.compile(r'<[^>]+>')
+_LEADING_JSON_RE = re.compile(r'[\{\[]')
+_WS_RE = re.compile(r'\s+')
+
 
 class BrowserHTMLParser:
     def __init__(
@@ -61,11 +69,33 @@ class BrowserHTMLParser:
             )
             raise DriverNotFoundError(msg)
 
-    def fetch_html(self, url: str, wait_time: int = 10, max_retries: int = 3) -> str:
+    def _wait_ready(self, wait_time: float, wait_for: Optional[str]) -> None:
+        """
+        Ждём readyState == 'complete' (и элемент wait_for, если задан),
+        но не дольше wait_time — вместо безусловного sleep(wait_time).
+        По таймауту просто отдаём то, что успело загрузиться.
+        """
+        def ready(d) -> bool:
+            if d.execute_script('return document.readyState') != 'complete':
+                return False
+            return not wait_for or bool(d.find_elements(By.CSS_SELECTOR, wait_for))
+
+        try:
+            WebDriverWait(self.driver, wait_time, poll_frequency=0.25).until(ready)
+        except TimeoutException:
+            pass
+
+    def fetch_html(
+        self,
+        url: str,
+        wait_time: int = 10,
+        max_retries: int = 3,
+        wait_for: Optional[str] = None,
+    ) -> str:
         for attempt in range(max_retries):
             try:
                 self.driver.get(url)
-                time.sleep(wait_time)
+                self._wait_ready(wait_time, wait_for)
                 src = self.driver.page_source or ''
                 if 'Ошибка 404' in src:
                     raise PageNotFoundError('Page not found (404)')
@@ -90,58 +120,31 @@ def _strip_bom_and_leading_junk(s: str) -> str:
     if not s:
         return s
     s = s.lstrip('\ufeff').strip()
-    m = re.search(r'[\{\[]', s)
+    m = _LEADING_JSON_RE.search(s)
     if not m:
         return s
     return s[m.start():].strip()
 
 
-def _extract_json_block(text: str) -> Optional[str]:
-    if not text:
-        return None
+_JSON_DECODER = _json.JSONDecoder()
 
-    in_tag = False
-    in_str = False
-    esc = False
-    stack: List[str] = []
-
-    start = -1
-    for i, ch in enumerate(text):
-        if in_tag:
-            if ch == '>':
-                in_tag = False
-            continue
 
-        if not in_str and ch == '<':
-            in_tag = True
-            continue
+def _extract_json_value(text: str):
+    """
+    Первое корректное JSON-значение (объект/массив) в тексте страницы.
+    Теги вырезаются одним regex, а скобки и строки отслеживает
+    JSONDecoder.raw_decode (C-модуль _json) — без посимвольного цикла на Python.
+    """
+    if not text:
+        return None
 
-        if not in_str and ch in '{[':
-            if start == -1:
-                start = i
-            stack.append(ch)
+    cleaned = _TAG_RE.sub('', text)
+    for m in _LEADING_JSON_RE.finditer(cleaned):
+        try:
+            obj, _ = _JSON_DECODER.raw_decode(cleaned, m.start())
+        except ValueError:
             continue
-
-        if start != -1:
-            if in_str:
-                if esc:
-                    esc = False
-                elif ch == '\\':
-                    esc = True
-                elif ch == '"':
-                    in_str = False
-            else:
-                if ch == '"':
-                    in_str = True
-                elif ch in '}]':
-                    if not stack:
-                        end = i + 1
-                        return text[start:end]
-                    top = stack.pop()
-                    if (top == '{' and ch == '}') or (top == '[' and ch == ']'):
-                        if not stack:
-                            end = i + 1
-                            return text[start:end]
+        return obj
 
     return None
 
@@ -157,10 +160,10 @@ def _extract_json_from_page_source(src: str):
         except Exception:
             pass
 
-    m = re.search(r'<pre[^>]*>(.*?)</pre>', src, flags=re.IGNORECASE | re.DOTALL)
+    m = _PRE_RE.search(src)
     if m:
         inner = m.group(1)
-        inner = _html.unescape(re.sub(r'<[^>]+>', '', inner)).strip()
+        inner = _html.unescape(_TAG_RE.sub('', inner)).strip()
         inner = _strip_bom_and_leading_junk(inner)
         if inner.startswith(('{', '[')):
             try:
@@ -168,15 +171,7 @@ def _extract_json_from_page_source(src: str):
             except Exception:
                 pass
 
-    block = _extract_json_block(src)
-    if block:
-        block = _strip_bom_and_leading_junk(block)
-        try:
-            return _json.loads(block)
-        except Exception:
-            return None
-
-    return None
+    return _extract_json_value(src)
 
 
 def fetch_json_via_browser(
@@ -205,6 +200,6 @@ def fetch_json_via_browser(
 
     data = _extract_json_from_page_source(html or '')
     if data is None and status_q:
-        snippet = (re.sub(r'\s+', ' ', html or '')[:260] + '...') if html else '(пусто)'
+        snippet = (_WS_RE.sub(' ', html or '')[:260] + '...') if html else '(пусто)'
         status_q.put(f'[html_parser] ответ не распознан как JSON: {snippet}')
     return data
@@ -19,13 +19,32 @@ def _split_id(vuln_id: str) -> Tuple[int, int, int]:
 def subtract_steps(last_id: str, steps: int) -> str:
     year, num, width = _split_id(last_id)
     num = max(0, num - max(0, steps))
+    return format_bdu_id(year, num, width)
+
+
+def format_bdu_id(year: int, num: int, width: int) -> str:
     return f'{year}-{num:0{width}d}'
 
 
-def iter_ids(start_id: str, end_id: str) -> List[str]:
+def parse_range(start_id: str, end_id: str) -> Tuple[int, int, int, int]:
+    """
+    Разбор и проверка диапазона один раз: (год, номер_от, номер_до, ширина номера).
+    """
     y1, n1, w1 = _split_id(start_id)
     y2, n2, w2 = _split_id(end_id)
     if y1 != y2 or n2 < n1:
         raise ValueError('Диапазон должен быть в рамках одного года и end ≥ start.')
-    width = max(w1, w2)
-    return [f'{y1}-{i:0{width}d}' for i in range(n1, n2 + 1)]
+    return y1, n1, n2, max(w1, w2)
+
+
+def count_ids(start_id: str, end_id: str) -> int:
+    # размер диапазона без построения списка ID
+    _, n1, n2, _ = parse_range(start_id, end_id)
+    return n2 - n1 + 1
+
+
+def iter_ids(start_id: str, end_id: str) -> List[str]:
+    year, n1, n2, width = parse_range(start_id, end_id)
+    # шаблон с годом и шириной собирается один раз, дальше — только номер
+    fmt = f'{year}-{{:0{width}d}}'.format
+    return list(map(fmt, range(n1, n2 + 1)))
@@ -1,10 +1,12 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
 
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import List, Optional, Tuple
 
 from cryptography.hazmat.primitives import serialization
-from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.hazmat.primitives.asymmetric import rsa, x25519
 
 
 def generate_rsa_keypair(private_path: Path,
@@ -26,3 +28,38 @@ def generate_rsa_keypair(private_path: Path,
     )
     private_path.write_bytes(priv_bytes)
     public_path.write_bytes(pub_bytes)
+
+
+def generate_rsa_keypairs(pairs: List[Tuple[Path, Path]],
+                          key_size: int = 2048,
+                          max_workers: Optional[int] = None) -> None:
+    """
+    Несколько пар ключей сразу: поиск простых чисел идёт в OpenSSL
+    без GIL, поэтому потоки генерируют ключи параллельно.
+    """
+    if not pairs:
+        return
+    with ThreadPoolExecutor(max_workers=max_workers or min(len(pairs), 8)) as pool:
+        futures = [
+            pool.submit(generate_rsa_keypair, private_path, public_path, key_size)
+            for private_path, public_path in pairs
+        ]
+        for fut in futures:
+            fut.result()
+
+
+def generate_x25519_keypair(private_path: Path,
+                            public_path: Path) -> None:
+    private_key = x25519.X25519PrivateKey.generate()
+    priv_bytes = private_key.private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption(),
+    )
+    public_key = private_key.public_key()
+    pub_bytes = public_key.public_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PublicFormat.SubjectPublicKeyInfo,
+    )
+    private_path.write_bytes(priv_bytes)
+    public_path.write_bytes(pub_bytes)
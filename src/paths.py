@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+"""
+Пути результатов, общие для db.py и processing.py.
+Вычисляются один раз при первом импорте модуля.
+"""
+
+import sys
+from pathlib import Path
+
+try:
+    # В реальном проекте config лежит рядом с src/*
+    from config import RESULTS_DIR  # type: ignore[attr-defined]
+except Exception:
+    # фоллбек, если config недоступен (например, при сборке в один exe)
+    ROOT_DIR = Path(getattr(sys, '_MEIPASS', Path(__file__).resolve().parent)).resolve()
+    RESULTS_DIR = ROOT_DIR / 'results'
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+
+DB_PATH = RESULTS_DIR / 'vuln.db'
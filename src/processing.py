@@ -14,29 +14,32 @@ processing.py
 
 import os
 import glob
-import sys
+import functools
+import threading
 import multiprocessing as mp
-from pathlib import Path
+import multiprocessing.pool
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import List, Iterable, Optional
+from typing import List, Iterable, Optional, Tuple
 from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
 
 import numpy as np
 import pandas as pd
 
-# --- пути проекта ---
 try:
-    # В реальном проекте config лежит рядом с src/*
-    from config import RESULTS_DIR  # type: ignore[attr-defined]
-except Exception:
-    # фоллбек, если config недоступен (например, при сборке в один exe)
-    ROOT_DIR = Path(getattr(sys, "_MEIPASS", Path(__file__).resolve().parent)).resolve()
-    RESULTS_DIR = ROOT_DIR / "results"
-    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    # pip install pyarrow — многопоточный CSV-парсер на C++ для чтения частей
+    import pyarrow  # noqa: F401
+    _HAS_PYARROW = True
+except ImportError:
+    _HAS_PYARROW = False
+
+# --- пути проекта ---
+from src.paths import RESULTS_DIR
 
 # --- зависимости проекта ---
 from src.ids import iter_ids
 from src.workers import worker_loop
+from src.html_parser import BrowserHTMLParser
 
 # --- работа с БД ---
 from .db import init_db, insert_vulnerabilities, DB_PATH
@@ -51,7 +54,7 @@ def _emit_status(q: Optional[mp.Queue], msg: str) -> None:
     if q is None:
         return
     try:
-        q.put(msg, block=False)
+        q.put(msg)
     except Exception:
         # Лог не обязателен, поэтому молча игнорируем сбой очереди
         pass
@@ -65,7 +68,7 @@ def _emit_progress_total(progress_q: Optional[mp.Queue], n: int) -> None:
     if progress_q is None:
         return
     try:
-        progress_q.put(("TOTAL", int(n)), block=False)
+        progress_q.put(("TOTAL", int(n)))
     except Exception:
         pass
 
@@ -74,16 +77,25 @@ def _emit_progress_total(progress_q: Optional[mp.Queue], n: int) -> None:
 # Чтение и объединение частей
 # =============================================================================
 
+_PART_EXT_ORDER = {".parquet": 0, ".csv": 1, ".xlsx": 2}
+
+
+def _part_sort_key(path: str) -> Tuple[bool, int, str]:
+    name = os.path.basename(path)
+    ext = os.path.splitext(name)[1].lower()
+    return name.startswith("retry_"), _PART_EXT_ORDER.get(ext, 3), name
+
+
 def _read_part(path: str) -> pd.DataFrame:
     """
     Универсальное чтение части результатов.
-    Обычно воркеры пишут CSV, но поддержим и xlsx/parquet.
+    Обычно воркеры пишут Parquet (или CSV без pyarrow), поддержим и xlsx.
     """
     ext = os.path.splitext(path)[1].lower()
     try:
         if ext == ".csv":
             # Важно: dtype=str, чтобы не ломать формат BDU-ID и прочие текстовые поля
-            return pd.read_csv(path, dtype=str, encoding="utf-8-sig")
+            return _read_csv_part(path)
         if ext in {".xlsx", ".xls"}:
             return pd.read_excel(path, dtype=str)
         if ext == ".parquet":
@@ -95,21 +107,50 @@ def _read_part(path: str) -> pd.DataFrame:
         return pd.DataFrame()
 
 
+def _read_csv_part(path: str) -> pd.DataFrame:
+    """
+    CSV-часть через движок pyarrow (BOM utf-8-sig он пропускает сам),
+    при его отсутствии или сбое — обычный C-парсер pandas.
+    Колонки в обоих случаях — object со строками, как и раньше.
+    """
+    if _HAS_PYARROW:
+        try:
+            return pd.read_csv(path, dtype=str, engine="pyarrow")
+        except Exception:
+            pass
+    return pd.read_csv(path, dtype=str, encoding="utf-8-sig")
+
+
 def _combine_parts(parts_paths: Iterable[str],
                    status_q: Optional[mp.Queue] = None) -> pd.DataFrame:
     """
-    Склеиваем все части одним concat (быстро, без лишних копий).
+    Склеиваем все части: при одинаковых схемах — по колонкам через
+    np.concatenate, при большом числе частей с разными схемами — через
+    np.vstack, иначе — одним concat.
     """
     paths = list(parts_paths)
     if not paths:
         return pd.DataFrame()
 
-    dfs: List[pd.DataFrame] = []
-    for p in paths:
+    def read(p: str):
         try:
-            df_part = _read_part(p)
+            return _read_part(p), None
         except Exception as e:
-            _emit_status(status_q, f"[processing] Не удалось прочитать {p}: {e}")
+            return None, e
+
+    # Разбор CSV/Parquet в pyarrow отпускает GIL — части читаем параллельно;
+    # map сохраняет исходный порядок частей (важно для дедупа keep="last")
+    max_workers = min(len(paths), os.cpu_count() or 4)
+    if max_workers > 1:
+        with ThreadPoolExecutor(max_workers=max_workers) as ex:
+            results = list(ex.map(read, paths))
+    else:
+        results = [read(p) for p in paths]
+
+    dfs: List[pd.DataFrame] = []
+    for p, (df_part, err) in zip(paths, results):
+        if err is not None:
+            _emit_status(status_q, f"[processing] Не удалось прочитать {p}: {err}")
             continue
         if not df_part.empty:
             dfs.append(df_part)
@@ -117,34 +158,55 @@ def _combine_parts(parts_paths: Iterable[str],
     if not dfs:
         return pd.DataFrame()
 
-    return pd.concat(dfs, ignore_index=True, copy=False, sort=False)
+    if len(dfs) == 1:
+        return dfs[0].reset_index(drop=True)
+
+    first_cols = list(dfs[0].columns)
+    if dfs[0].columns.is_unique and all(list(df.columns) == first_cols for df in dfs[1:]):
+        # Схемы совпадают (обычный случай — все part_* от одних воркеров):
+        # склеиваем каждую колонку одним np.concatenate, без блоков concat
+        return pd.DataFrame(
+            {c: np.concatenate([df[c].to_numpy(copy=False) for df in dfs]) for c in first_cols},
+            columns=first_cols,
+        )
+
+    columns = list(dict.fromkeys(c for df in dfs for c in df.columns))
+    if len(dfs) > 4 and any(len(df.columns) != len(columns) for df in dfs):
+        # Наборы колонок у частей разные (part/retry_part, CSV/xlsx): concat
+        # выравнивает их попарно и сливает блоки. Выравниваем сами и стекуем
+        # одним np.vstack — все части строковые (object), dtype сохраняется.
+        values = np.vstack([
+            df.reindex(columns=columns).to_numpy(dtype=object, copy=False)
+            for df in dfs
+        ])
+        return pd.DataFrame(values, columns=columns)
+
+    return pd.concat(dfs, ignore_index=True, sort=False)
 
 
 # =============================================================================
 # Нормализация колонок и URL
 # =============================================================================
 
+_SOURCE_ALIASES = frozenset({"url", "link", "address", "адрес источника", "источник"})
+
+
 def _unify_source_column(df: pd.DataFrame) -> pd.DataFrame:
     """
     Приводим разные варианты названия колонки с URL к единому 'Источник'.
+    Берём первую (по порядку колонок) подходящую.
     """
     if df is None or df.empty:
         return df
 
+    # обычный случай — колонка уже называется 'Источник' (хеш-поиск в Index)
     if "Источник" in df.columns:
         return df
 
-    rename_map = {}
-    for col in df.columns:
-        low = str(col).strip().lower()
-        if low in {"url", "link", "address", "адрес источника", "источник"}:
-            rename_map[col] = "Источник"
-            break
-
-    if rename_map:
-        df = df.rename(columns=rename_map)
-
-    return df
+    src = next((c for c in df.columns if str(c).strip().lower() in _SOURCE_ALIASES), None)
+    if src is None:
+        return df
+    return df.rename(columns={src: "Источник"})
 
 
 def _normalize_url(url: object) -> object:
@@ -158,6 +220,16 @@ def _normalize_url(url: object) -> object:
     if not isinstance(url, str) or not url:
         return url
 
+    # частый случай: ни якоря, ни utm_ — разбирать и собирать query незачем
+    if "#" not in url and "utm_" not in url.lower():
+        return url
+
+    return _normalize_url_slow(url)
+
+
+@functools.lru_cache(maxsize=8192)
+def _normalize_url_slow(url: str) -> str:
+    # одни и те же ссылки (источник CVE на несколько BDU) повторяются между частями
     try:
         parts = urlsplit(url)
     except Exception:
@@ -174,6 +246,25 @@ def _normalize_url(url: object) -> object:
     return urlunsplit((parts.scheme, parts.netloc, parts.path, new_query, ""))
 
 
+def _normalize_url_series(s: pd.Series) -> pd.Series:
+    """
+    Векторный вариант _normalize_url для целой колонки:
+    якорь и utm_* параметры вырезаются regex-проходами pandas (.str),
+    без urlsplit/parse_qsl/urlencode на каждую строку.
+    Пустые значения (NaN) остаются пустыми.
+    """
+    try:
+        out = s.str.split("#", n=1).str[0]
+    except AttributeError:
+        # колонка без строк (.str недоступен) — как раньше, поэлементно
+        return s.map(_normalize_url)
+    out = out.str.replace(r"(?i)([?&])utm_[^&]*", r"\1", regex=True)
+    # подчистка: "?&..." → "?", "&&" → "&", хвостовые ? / &
+    out = out.str.replace(r"\?&+", "?", regex=True)
+    out = out.str.replace(r"&{2,}", "&", regex=True)
+    return out.str.replace(r"[?&]+$", "", regex=True)
+
+
 def _apply_output_order(df: pd.DataFrame,
                         friendly_order: Optional[List[str]]) -> pd.DataFrame:
     """
@@ -183,13 +274,33 @@ def _apply_output_order(df: pd.DataFrame,
     if df is None or df.empty:
         return df
 
+    # Копии не делаем: _sort_and_renumber всё равно строит новый фрейм
     if not friendly_order:
-        return df.copy()
+        return df
 
     existing = list(df.columns)
-    ordered = [c for c in friendly_order if c in existing]
-    tail = [c for c in existing if c not in ordered]
-    return df[ordered + tail]
+    existing_set = set(existing)
+    ordered = [c for c in friendly_order if c in existing_set]
+    ordered_set = set(ordered)
+    columns = ordered + [c for c in existing if c not in ordered_set]
+    if columns == existing:
+        return df
+    return df[columns]
+
+
+_NAT_INT64 = np.iinfo(np.int64).min
+
+
+def _desc_order_nat_last(key: np.ndarray) -> np.ndarray:
+    """
+    Порядок строк по убыванию int64-ключа (даты в нс), устойчивый,
+    NaT (= INT64_MIN) — в конце, как sort_values(ascending=False).
+    """
+    valid = key != _NAT_INT64
+    idx = np.flatnonzero(valid)
+    # у валидных значений минус не переполняется (они > INT64_MIN)
+    ordered = idx[np.argsort(-key[idx], kind="stable")]
+    return np.concatenate([ordered, np.flatnonzero(~valid)])
 
 
 def _sort_and_renumber(df: pd.DataFrame,
@@ -202,14 +313,13 @@ def _sort_and_renumber(df: pd.DataFrame,
     if df is None or df.empty:
         return df
 
-    df = df.copy()
-
-    # Сортировка
+    # Сортировка (без df.copy(): sort_values/reset_index и так отдают новый фрейм)
     if "Дата" in df.columns:
         # Не падаем, если формат странный
         try:
-            df["_sort_date"] = pd.to_datetime(df["Дата"], errors="coerce")
-            df = df.sort_values("_sort_date", ascending=False, kind="mergesort")
+            dates = pd.to_datetime(df["Дата"], errors="coerce")
+            key = dates.to_numpy(dtype="datetime64[ns]").view("int64")
+            df = df.iloc[_desc_order_nat_last(key)]
         except Exception:
             df = df.sort_values("Дата", ascending=False, kind="mergesort")
     elif "CVE" in df.columns:
@@ -218,24 +328,20 @@ def _sort_and_renumber(df: pd.DataFrame,
         df = df.sort_values("Источник", ascending=True, kind="mergesort")
 
     # Нумерация
-    df = df.reset_index(drop=True)
-    n = len(df)
-
     if "№" in df.columns:
         df = df.drop(columns=["№"])
+    df = df.reset_index(drop=True)
+    n = len(df)
 
     pos = 0
     if friendly_order:
         try:
-            pos = max(0, int(friendly_order.index("№")))
+            pos = min(max(0, int(friendly_order.index("№"))), len(df.columns))
         except ValueError:
             pos = 0
 
-    df.insert(loc=pos, column="№", value=np.arange(1, n + 1, dtype=np.int64))
-
-    # Техническую колонку сортировки удалим
-    if "_sort_date" in df.columns:
-        df = df.drop(columns=["_sort_date"])
+    # int32 хватает для числа строк и вдвое экономнее int64
+    df.insert(loc=pos, column="№", value=np.arange(1, n + 1, dtype=np.int32))
 
     return df
 
@@ -245,24 +351,27 @@ def _cleanup_temp_parts(status_q: Optional[mp.Queue] = None) -> None:
     Удаляем временные файлы part_*.csv / reserved_part_*.txt / missed404_part_*.txt
     из RESULTS_DIR после успешной обработки.
     """
-    patterns = [
-        "part_*.csv",
-        "retry_part_*.csv",
-        "part_*.parquet",
-        "retry_part_*.parquet",
-        "part_*.xlsx",
-        "retry_part_*.xlsx",
-        "reserved_part_*.txt",
-        "missed404_part_*.txt",
-    ]
+    # Один проход os.scandir вместо glob на каждый шаблон:
+    # (префикс, допустимые расширения) ~ part_*.csv, reserved_part_*.txt и т.д.
+    patterns = (
+        (("part_", "retry_part_"), (".csv", ".parquet", ".xlsx")),
+        (("reserved_part_", "missed404_part_"), (".txt",)),
+    )
     removed = 0
-    for pat in patterns:
-        for p in Path(RESULTS_DIR).glob(pat):
-            try:
-                p.unlink()
-                removed += 1
-            except OSError:
-                continue
+    try:
+        with os.scandir(RESULTS_DIR) as it:
+            for entry in it:
+                name = entry.name
+                if not any(name.startswith(pre) and name.endswith(suf)
+                           for pre, suf in patterns):
+                    continue
+                try:
+                    os.unlink(entry.path)
+                    removed += 1
+                except OSError:
+                    continue
+    except OSError:
+        return
 
     if removed and status_q is not None:
         _emit_status(status_q, f"[processing] Временные файлы удалены: {removed} шт.")
@@ -287,25 +396,160 @@ def _chunkify(items: List[str], n_chunks: int) -> List[List[str]]:
     return [items[i: i + avg] for i in range(0, len(items), avg)]
 
 
+# Каждый батч поднимает свой Chrome, поэтому батчи совсем мелкими не делаем
+_MIN_BATCH = 32
+_BATCHES_PER_WORKER = 8
+
+
+def _batch_count(n_ids: int, workers: int) -> int:
+    """
+    Сколько батчей нарезать: до _BATCHES_PER_WORKER на воркер,
+    но не меньше _MIN_BATCH ID в батче и не меньше одного батча на воркер.
+    """
+    by_size = -(-n_ids // _MIN_BATCH)  # ceil
+    return max(workers, min(workers * _BATCHES_PER_WORKER, by_size))
+
+
+# Очереди процесса пула: mp.Queue нельзя передать задачей в Pool,
+# только унаследовать через initializer
+_pool_progress_q: Optional[mp.Queue] = None
+_pool_status_q: Optional[mp.Queue] = None
+# Барьер на все процессы пула — чтобы в конце запуска каждый процесс
+# получил ровно одну задачу закрытия браузера (см. _pool_release_driver)
+_pool_barrier = None
+# Браузер процесса пула: один на все батчи запуска, а не свой на каждый
+_pool_driver: Optional[BrowserHTMLParser] = None
+
+
+def _pool_worker_init(progress_q: Optional[mp.Queue],
+                      status_q: Optional[mp.Queue],
+                      barrier=None) -> None:
+    global _pool_progress_q, _pool_status_q, _pool_barrier
+    _pool_progress_q = progress_q
+    _pool_status_q = status_q
+    _pool_barrier = barrier
+
+
+def _pool_close_driver() -> None:
+    global _pool_driver
+    if _pool_driver is None:
+        return
+    try:
+        _pool_driver.close()
+    except Exception:
+        pass
+    _pool_driver = None
+
+
+def _pool_get_driver() -> Optional[BrowserHTMLParser]:
+    """
+    Браузер процесса пула: запускается при первом батче и переиспользуется
+    следующими (старт Chrome — секунды на каждый батч). Если браузер
+    перестал отвечать — перезапускаем. None — не поднялся, тогда
+    worker_loop попробует сам и отработает чанк как пропущенный.
+    """
+    global _pool_driver
+    if _pool_driver is not None:
+        try:
+            _pool_driver.driver.execute_script("return 1")
+            return _pool_driver
+        except Exception:
+            _pool_close_driver()
+    try:
+        _pool_driver = BrowserHTMLParser(headless=True)
+    except Exception:
+        _pool_driver = None
+    return _pool_driver
+
+
+def _pool_worker_loop(chunk: List[str], out_dir: str, idx: int) -> None:
+    # один процесс пула может взять несколько чанков — имя части делаем уникальным
+    worker_loop(chunk, out_dir, _pool_progress_q, _pool_status_q,
+                part_id=f"{os.getpid()}_{idx}",
+                driver=_pool_get_driver())
+
+
+def _pool_release_driver(_: int) -> None:
+    # Пока процесс ждёт на барьере, он не возьмёт вторую задачу, поэтому
+    # N задач расходятся ровно по одной на каждый из N процессов
+    if _pool_barrier is not None:
+        try:
+            _pool_barrier.wait(timeout=60)
+        except threading.BrokenBarrierError:
+            # барьер сломан таймаутом (процесс завис или упал); без reset
+            # пул GUI жил бы со сломанным барьером, все следующие wait падали
+            # бы сразу, и задачи закрытия расходились бы по процессам как попало
+            try:
+                _pool_barrier.reset()
+            except Exception:
+                pass
+        except Exception:
+            pass
+    _pool_close_driver()
+
+
+def _release_pool_drivers(pool: multiprocessing.pool.Pool, processes: int) -> None:
+    """
+    Закрываем браузеры процессов пула в конце запуска: пул GUI живёт
+    между запусками и при выходе делает terminate — браузеры не должны
+    оставаться висеть ни между запусками, ни после закрытия программы.
+    processes — размер пула, с которым он создан в create_worker_pool.
+    """
+    if processes <= 0:
+        return
+    try:
+        pool.map(_pool_release_driver, range(processes), chunksize=1)
+    except Exception:
+        pass
+
+
+def create_worker_pool(workers: int,
+                       progress_q: Optional[mp.Queue],
+                       status_q: Optional[mp.Queue]) -> multiprocessing.pool.Pool:
+    """
+    Долгоживущий пул воркеров для повторных запусков (GUI):
+    импорт модулей при spawn оплачивается один раз, а не на каждый диапазон.
+    Очереди привязываются к пулу при создании.
+    """
+    processes = max(1, int(workers))
+    return mp.Pool(processes=processes,
+                   initializer=_pool_worker_init,
+                   initargs=(progress_q, status_q, mp.Barrier(processes)))
+
+
 def _start_workers(ids: List[str],
                    workers: int,
                    progress_q: Optional[mp.Queue],
-                   status_q: Optional[mp.Queue]) -> None:
+                   status_q: Optional[mp.Queue],
+                   pool: Optional[multiprocessing.pool.Pool] = None) -> None:
     """
-    Запускаем несколько процессов worker_loop, каждый пишет part_*.csv в RESULTS_DIR.
+    Запускаем воркеры worker_loop, каждый пишет part_*.parquet (или .csv) в RESULTS_DIR.
+    ID режем на батчи мельче, чем по одному на воркер: пул раздаёт их
+    по одному (chunksize=1), и освободившийся процесс берёт следующий —
+    медленный (404/таймауты) кусок диапазона не держит остальные ядра.
+    Если передан пул — батчи уходят в него (очереди уже привязаны к пулу;
+    пул должен быть создан через create_worker_pool(workers, ...)),
+    иначе создаём временный пул на этот запуск.
     """
-    chunks = _chunkify(ids, max(1, workers))
-    procs: List[mp.Process] = []
+    workers = max(1, int(workers))
+    chunks = _chunkify(ids, _batch_count(len(ids), workers))
+    tasks = [(chunk, str(RESULTS_DIR), i) for i, chunk in enumerate(chunks)]
 
-    for chunk in chunks:
-        p = mp.Process(target=worker_loop,
-                       args=(chunk, str(RESULTS_DIR), progress_q, status_q))
-        p.start()
-        procs.append(p)
+    if pool is not None:
+        try:
+            pool.starmap(_pool_worker_loop, tasks, chunksize=1)
+        finally:
+            _release_pool_drivers(pool, workers)
+        return
 
-    # Ждём завершения всех процессов
-    for p in procs:
-        p.join()
+    tmp_size = max(1, min(workers, len(chunks)))
+    tmp_pool = create_worker_pool(tmp_size, progress_q, status_q)
+    try:
+        tmp_pool.starmap(_pool_worker_loop, tasks, chunksize=1)
+    finally:
+        _release_pool_drivers(tmp_pool, tmp_size)
+        tmp_pool.close()
+        tmp_pool.join()
 
 
 # =============================================================================
@@ -329,11 +573,12 @@ def _build_final_dataframe(parts_paths: Iterable[str],
     run_raw = _unify_source_column(run_raw)
 
     if "Источник" in run_raw.columns:
-        norm = run_raw["Источник"].map(_normalize_url)
-        run_raw = run_raw.assign(_src_norm=norm)
-        # Дедуп: оставляем последнюю запись по нормализованному URL
-        run_raw = run_raw.drop_duplicates(subset=["_src_norm"], keep="last")
-        run_raw = run_raw.drop(columns=["_src_norm"])
+        norm = _normalize_url_series(run_raw["Источник"]).to_numpy()
+        # Дедуп: оставляем последнюю запись по нормализованному URL —
+        # одной булевой маской, без временной колонки
+        dup = pd.Index(norm).duplicated(keep="last")
+        if dup.any():
+            run_raw = run_raw.loc[~dup]
 
     # Применяем порядок колонок, заданный в GUI
     view = _apply_output_order(run_raw, friendly_order=friendly_order)
@@ -354,7 +599,8 @@ def process_ids_parallel(ids: List[str],
                          progress_q: Optional[mp.Queue],
                          status_q: Optional[mp.Queue],
                          update_master_vuln: bool = True,
-                         update_master_reserved: bool = False) -> str:
+                         update_master_reserved: bool = False,
+                         pool: Optional[multiprocessing.pool.Pool] = None) -> str:
     """
     Основная точка запуска для ФСТЭК:
     - запускает воркеров по BDU-ID,
@@ -365,6 +611,7 @@ def process_ids_parallel(ids: List[str],
 
     Параметры update_master_* сохранены для обратной совместимости,
     но в новой версии не используются (мастером является сама БД).
+    pool — готовый пул из create_worker_pool (иначе процессы создаются заново).
     """
     if friendly_order is None:
         friendly_order = []
@@ -385,20 +632,24 @@ def process_ids_parallel(ids: List[str],
     _start_workers(ids=ids,
                    workers=max(1, int(workers or 1)),
                    progress_q=progress_q,
-                   status_q=status_q)
+                   status_q=status_q,
+                   pool=pool)
 
     # 2) Сбор частей
+    # Сначала основные части, потом retry_* (при дедупе побеждают они);
+    # внутри группы — parquet (его пишут воркеры), затем csv/xlsx
     parts = sorted(
-        glob.glob(str(RESULTS_DIR / "part_*.csv")) +
-        glob.glob(str(RESULTS_DIR / "retry_part_*.csv")) +
         glob.glob(str(RESULTS_DIR / "part_*.parquet")) +
-        glob.glob(str(RESULTS_DIR / "retry_part_*.parquet")) +
+        glob.glob(str(RESULTS_DIR / "part_*.csv")) +
         glob.glob(str(RESULTS_DIR / "part_*.xlsx")) +
-        glob.glob(str(RESULTS_DIR / "retry_part_*.xlsx"))
+        glob.glob(str(RESULTS_DIR / "retry_part_*.parquet")) +
+        glob.glob(str(RESULTS_DIR / "retry_part_*.csv")) +
+        glob.glob(str(RESULTS_DIR / "retry_part_*.xlsx")),
+        key=_part_sort_key,
     )
 
     if not parts:
-        _emit_status(status_q, "[processing] Не найдено файлов частей (part_*.csv и др.).")
+        _emit_status(status_q, "[processing] Не найдено файлов частей (part_*.parquet, part_*.csv и др.).")
         _cleanup_temp_parts(status_q=status_q)
         return str(DB_PATH)
 
@@ -430,7 +681,8 @@ def process_range_from_to(start_id: str,
                           progress_q: Optional[mp.Queue],
                           status_q: Optional[mp.Queue],
                           update_master_vuln: bool = True,
-                          update_master_reserved: bool = False) -> Optional[str]:
+                          update_master_reserved: bool = False,
+                          pool: Optional[multiprocessing.pool.Pool] = None) -> Optional[str]:
     """
     Обёртка для UI и авто-режима:
     - принимает границы BDU-ID,
@@ -442,7 +694,7 @@ def process_range_from_to(start_id: str,
         friendly_order = []
 
     try:
-        ids_list = list(iter_ids(start_id, end_id))
+        ids_list = iter_ids(start_id, end_id)
     except Exception as e:
         _emit_status(status_q, f"[processing] Ошибка диапазона BDU-ID: {e}")
         if status_q is not None:
@@ -460,6 +712,7 @@ def process_range_from_to(start_id: str,
         status_q=status_q,
         update_master_vuln=update_master_vuln,
         update_master_reserved=update_master_reserved,
+        pool=pool,
     )
 
     if status_q is not None and result_path:
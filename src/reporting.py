@@ -1,47 +1,86 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
 
+import functools
 import re
 import sqlite3
 from collections import defaultdict
 from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Sequence, Tuple
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
 
 from docx import Document  # pip install python-docx
 
-from src.db import DB_PATH, init_db, RESULTS_DIR
+from src.db import init_db
+from src.paths import DB_PATH, RESULTS_DIR
 
 
 # ---------------------------------------------------------------------------
 # Модели и утилиты
 # ---------------------------------------------------------------------------
 
-@dataclass
+# Шаблоны компилируем один раз: функции ниже вызываются на каждую пару
+# (ПО × уязвимость), и поиск в кеше re на каждом вызове заметен
+_VER_TOKEN = r'[0-9][0-9A-Za-z\.\-\_]*'
+_TOKEN_SPLIT_RE = re.compile(r'[^0-9A-Za-zА-Яа-я]+')
+_DIGITS_RE = re.compile(r'\d+')
+_BEFORE_RE = re.compile(r'(before|prior to)\s+(' + _VER_TOKEN + ')')
+_THROUGH_RE = re.compile(r'(through)\s+(' + _VER_TOKEN + ')')
+_CMP_RE = re.compile(r'(<=|>=|<|>)\s*(' + _VER_TOKEN + ')')
+_AND_EARLIER_RE = re.compile(r'(' + _VER_TOKEN + r')\s+and\s+earlier')
+_VERSION_RE = re.compile(r'versions?\s+(' + _VER_TOKEN + ')')
+
+
+@dataclass(frozen=True)
 class VersionConstraint:
     op: str  # "<", "<=", "==", ">=", ">", "range"
     v1: Tuple[int, ...]
     v2: Optional[Tuple[int, ...]] = None  # для диапазона
 
 
-def normalize_text(s: str) -> List[str]:
+@functools.lru_cache(maxsize=16384)
+def normalize_text(s: str) -> Tuple[str, ...]:
     """
     Разбиваем строку на токены: буквы+цифры, в нижнем регистре.
+    Результат кешируется (tuple — неизменяемый), одни и те же product/title
+    встречаются для каждого ПО каждого хоста.
     """
-    tokens = re.split(r'[^0-9A-Za-zА-Яа-я]+', s.lower())
-    return [t for t in tokens if t]
+    tokens = _TOKEN_SPLIT_RE.split(s.lower())
+    return tuple(t for t in tokens if t)
 
 
-def tokens_similarity(a: Sequence[str], b: Sequence[str]) -> float:
+def tokens_similarity(
+    a: Sequence[str] | frozenset,
+    b: Sequence[str] | frozenset,
+    threshold: float = 0.0,
+) -> float:
     """
     Простая метрика похожести: |пересечение| / max(|A|, |B|).
+    Готовые frozenset используются как есть. Если задан threshold и
+    оставшихся токенов уже не хватает до него — выходим раньше с 0.0
+    (для сравнения «< threshold» результат тот же).
     """
-    set_a, set_b = set(a), set(b)
+    set_a = a if isinstance(a, frozenset) else frozenset(a)
+    set_b = b if isinstance(b, frozenset) else frozenset(b)
     if not set_a or not set_b:
         return 0.0
-    inter = len(set_a & set_b)
-    return inter / max(len(set_a), len(set_b))
+
+    denom = max(len(set_a), len(set_b))
+    need = threshold * denom
+    small, large = (set_a, set_b) if len(set_a) <= len(set_b) else (set_b, set_a)
+
+    hits = 0
+    remaining = len(small)
+    if remaining < need:
+        return 0.0
+    for t in small:
+        remaining -= 1
+        if t in large:
+            hits += 1
+        elif hits + remaining < need:
+            return 0.0
+    return hits / denom
 
 
 def parse_version(s: str) -> Optional[Tuple[int, ...]]:
@@ -51,7 +90,7 @@ def parse_version(s: str) -> Optional[Tuple[int, ...]]:
     """
     if not s:
         return None
-    parts = re.findall(r'\d+', s)
+    parts = _DIGITS_RE.findall(s)
     if not parts:
         return None
     return tuple(int(p) for p in parts)
@@ -79,7 +118,8 @@ def compare_versions(a: Tuple[int, ...], b: Tuple[int, ...]) -> int:
 # Извлечение версионных ограничений из строки product
 # ---------------------------------------------------------------------------
 
-def extract_version_constraints(product: str) -> List[VersionConstraint]:
+@functools.lru_cache(maxsize=16384)
+def extract_version_constraints(product: str) -> Tuple[VersionConstraint, ...]:
     """
     Пытаемся понять из текста product, какие версии уязвимы.
     Поддерживаем базовые варианты:
@@ -89,48 +129,49 @@ def extract_version_constraints(product: str) -> List[VersionConstraint]:
       - '<= 7.3.1' / '>= 7.3.1'
       - '7.3.1 and earlier'    -> op "<="
       - 'version 7.3.1'        -> op "==" (если ничего больше нет)
-    Если ничего уверенного не нашли — возвращаем пустой список.
+    Если ничего уверенного не нашли — возвращаем пустой кортеж.
+    Результат кешируется по исходной строке.
     """
     if not product:
-        return []
+        return ()
 
     text = product.lower()
     constraints: List[VersionConstraint] = []
 
     # before / prior to
-    for m in re.finditer(r'(before|prior to)\s+([0-9][0-9A-Za-z\.\-\_]*)', text):
+    for m in _BEFORE_RE.finditer(text):
         ver = parse_version(m.group(2))
         if ver:
             constraints.append(VersionConstraint('<', ver))
 
     # through
-    for m in re.finditer(r'(through)\s+([0-9][0-9A-Za-z\.\-\_]*)', text):
+    for m in _THROUGH_RE.finditer(text):
         ver = parse_version(m.group(2))
         if ver:
             constraints.append(VersionConstraint('<=', ver))
 
     # <= / >= / < / >
-    for m in re.finditer(r'(<=|>=|<|>)\s*([0-9][0-9A-Za-z\.\-\_]*)', text):
+    for m in _CMP_RE.finditer(text):
         op = m.group(1)
         ver = parse_version(m.group(2))
         if ver:
             constraints.append(VersionConstraint(op, ver))
 
     # 'X and earlier'
-    for m in re.finditer(r'([0-9][0-9A-Za-z\.\-\_]*)\s+and\s+earlier', text):
+    for m in _AND_EARLIER_RE.finditer(text):
         ver = parse_version(m.group(1))
         if ver:
             constraints.append(VersionConstraint('<=', ver))
 
     # 'version 7.3.1' / 'versions 7.3.1'
     if not constraints:
-        m = re.search(r'versions?\s+([0-9][0-9A-Za-z\.\-\_]*)', text)
+        m = _VERSION_RE.search(text)
         if m:
             ver = parse_version(m.group(1))
             if ver:
                 constraints.append(VersionConstraint('==', ver))
 
-    return constraints
+    return tuple(constraints)
 
 
 def version_satisfies(installed: Tuple[int, ...], cons: VersionConstraint) -> bool:
@@ -159,13 +200,18 @@ def version_is_vulnerable(installed_version: Optional[str], product_text: str) -
     """
     if not installed_version:
         return 'unknown'
+    return check_version(parse_version(installed_version), extract_version_constraints(product_text))
 
-    iv = parse_version(installed_version)
-    if not iv:
-        return 'unknown'
 
-    constraints = extract_version_constraints(product_text)
-    if not constraints:
+def check_version(
+    iv: Optional[Tuple[int, ...]],
+    constraints: Sequence[VersionConstraint],
+) -> str:
+    """
+    То же, что version_is_vulnerable, но по уже разобранной версии
+    и готовым ограничениям (для цикла ПО × уязвимости).
+    """
+    if not iv or not constraints:
         return 'unknown'
 
     any_match = any(version_satisfies(iv, c) for c in constraints)
@@ -182,27 +228,40 @@ def version_is_vulnerable(installed_version: Optional[str], product_text: str) -
 # Загрузка данных из БД
 # ---------------------------------------------------------------------------
 
-def _load_data() -> Tuple[List[sqlite3.Row], Dict[str, List[sqlite3.Row]], List[sqlite3.Row]]:
+_FETCH_ARRAYSIZE = 2000
+
+
+def _load_data() -> Tuple[List[sqlite3.Row], Dict[str, List[sqlite3.Row]], List[PreparedVuln]]:
+    """
+    Агенты, ПО по агентам и уже подготовленные уязвимости (prepare_vulns).
+    Курсоры читаются потоково (пачками по arraysize): ПО сразу раскладывается
+    по агентам, уязвимости токенизируются по мере чтения — полного списка
+    sqlite3.Row в памяти не возникает.
+    """
     init_db()
     conn = sqlite3.connect(str(DB_PATH))
     conn.row_factory = sqlite3.Row
     try:
         agents = conn.execute('SELECT * FROM agents').fetchall()
-        software_rows = conn.execute('SELECT * FROM agent_software').fetchall()
-        vulns = conn.execute(
+
+        soft_by_agent: Dict[str, List[sqlite3.Row]] = defaultdict(list)
+        cur = conn.execute('SELECT * FROM agent_software')
+        cur.arraysize = _FETCH_ARRAYSIZE
+        for row in cur:
+            soft_by_agent[row['agent_id']].append(row)
+
+        cur = conn.execute(
             '''
             SELECT id, cve, vendor, product, title, cvss, severity, url
             FROM vulnerabilities
             '''
-        ).fetchall()
+        )
+        cur.arraysize = _FETCH_ARRAYSIZE
+        prepared = prepare_vulns(cur)
     finally:
         conn.close()
 
-    soft_by_agent: Dict[str, List[sqlite3.Row]] = defaultdict(list)
-    for row in software_rows:
-        soft_by_agent[row['agent_id']].append(row)
-
-    return agents, soft_by_agent, vulns
+    return agents, soft_by_agent, prepared
 
 
 # ---------------------------------------------------------------------------
@@ -213,10 +272,54 @@ SIM_THRESHOLD_NAME = 0.3   # порог похожести имени проду
 SIM_THRESHOLD_VENDOR = 0.5  # порог похожести вендора (если оба указаны)
 
 
+# (id, строка уязвимости, токены product/title, токены vendor или None,
+#  версионные ограничения из product)
+PreparedVuln = Tuple[int, sqlite3.Row, frozenset, Optional[frozenset], Tuple[VersionConstraint, ...]]
+
+
+def prepare_vulns(vulns: Iterable[sqlite3.Row]) -> List[PreparedVuln]:
+    """
+    Токенизируем уязвимости и разбираем ограничения версий один раз
+    (а не на каждое ПО каждого хоста).
+    Записи без токенов в product/title отбрасываем сразу.
+    """
+    prepared: List[PreparedVuln] = []
+    for v in vulns:
+        v_product = (v['product'] or '').strip()
+        v_vendor = (v['vendor'] or '').strip()
+        prod_tokens = normalize_text(v_product) or normalize_text(v['title'] or '')
+        if not prod_tokens:
+            continue
+        vend_tokens = frozenset(normalize_text(v_vendor)) if v_vendor else None
+        prepared.append((
+            int(v['id']),
+            v,
+            frozenset(prod_tokens),
+            vend_tokens,
+            extract_version_constraints(v_product),
+        ))
+    return prepared
+
+
+def build_token_index(prepared: List[PreparedVuln]) -> Dict[str, List[int]]:
+    """
+    Инвертированный индекс: токен product/title -> позиции в prepared
+    (по возрастанию). Кандидаты для ПО — только уязвимости с общим токеном:
+    без пересечения similarity = 0 и порог имени не пройти.
+    """
+    postings: Dict[str, List[int]] = defaultdict(list)
+    for idx, item in enumerate(prepared):
+        for t in item[2]:
+            postings[t].append(idx)
+    return dict(postings)
+
+
 def match_vulns_for_agent(
     agent: sqlite3.Row,
     soft_by_agent: Dict[str, List[sqlite3.Row]],
-    vulns: List[sqlite3.Row],
+    vulns: Optional[List[sqlite3.Row]] = None,
+    prepared: Optional[List[PreparedVuln]] = None,
+    index: Optional[Dict[str, List[int]]] = None,
 ) -> Dict[int, Dict[str, Any]]:
     """
     Возвращает словарь:
@@ -228,47 +331,61 @@ def match_vulns_for_agent(
       1) похожесть названия ПО и product (по токенам, % совпадения);
       2) если есть vendor/publisher — доп.критерий;
       3) попытка проверить версию (match / mismatch / unknown).
+    Нужен либо vulns, либо prepared — результат prepare_vulns (с ним можно
+    передать index из build_token_index), чтобы не готовить их заново
+    для каждого хоста.
     """
     matches: Dict[int, Dict[str, Any]] = {}
     agent_soft = soft_by_agent.get(agent['agent_id'], [])
-
+    if not agent_soft:
+        return matches
+    if prepared is None:
+        if vulns is None:
+            raise ValueError('match_vulns_for_agent: нужен vulns или prepared')
+        prepared = prepare_vulns(vulns)
+        index = None
+    if index is None:
+        index = build_token_index(prepared)
+
+    # ПО хоста тоже разбираем один раз: токены имени/издателя и версия
+    soft_pre = []
     for sw in agent_soft:
         sw_name = (sw['name'] or '').strip()
         if not sw_name:
             continue
-
         sw_publisher = (sw['publisher'] or '').strip()
-        sw_name_tokens = normalize_text(sw_name)
-        sw_pub_tokens = normalize_text(sw_publisher)
-
-        for v in vulns:
-            vid = int(v['id'])
-            v_product = (v['product'] or '').strip()
-            v_vendor = (v['vendor'] or '').strip()
+        soft_pre.append((
+            sw,
+            frozenset(normalize_text(sw_name)),
+            frozenset(normalize_text(sw_publisher)) if sw_publisher else None,
+            parse_version(sw['version']) if sw['version'] else None,
+        ))
+
+    for sw, sw_name_tokens, sw_pub_tokens, sw_ver in soft_pre:
+        # кандидаты из индекса в исходном порядке уязвимостей —
+        # порядок в отчёте тот же, что при полном переборе
+        candidates = sorted(set().union(*(index.get(t, ()) for t in sw_name_tokens)))
+        for idx in candidates:
+            vid, v, prod_tokens, vend_tokens, constraints = prepared[idx]
 
             # 1. Похожесть названия продукта
-            prod_tokens = normalize_text(v_product) or normalize_text(v['title'] or '')
-            if not prod_tokens:
-                continue
-
             # Специальное правило: VirtualBox ↔ VirtualBox Guest Additions
             if "virtualbox" in sw_name_tokens and "virtualbox" in prod_tokens:
                 sim_name = 1.0
             else:
-                sim_name = tokens_similarity(sw_name_tokens, prod_tokens)
+                sim_name = tokens_similarity(sw_name_tokens, prod_tokens, SIM_THRESHOLD_NAME)
 
             if sim_name < SIM_THRESHOLD_NAME:
                 continue
 
             # 2. Похожесть вендора, если оба указаны
-            if v_vendor and sw_publisher:
-                vend_tokens = normalize_text(v_vendor)
-                vend_sim = tokens_similarity(sw_pub_tokens, vend_tokens)
+            if vend_tokens is not None and sw_pub_tokens is not None:
+                vend_sim = tokens_similarity(sw_pub_tokens, vend_tokens, SIM_THRESHOLD_VENDOR)
                 if vend_sim < SIM_THRESHOLD_VENDOR:
                     continue
 
             # 3. Версионность
-            vcheck = version_is_vulnerable(sw['version'], v_product)
+            vcheck = check_version(sw_ver, constraints)
 
             # явный mismatch считаем безопасным и не выводим
             if vcheck == 'mismatch':
@@ -298,7 +415,7 @@ def generate_vulnerability_report(output_dir: Path | None = None) -> Path:
     Генерирует отчёт в формате .docx.
     Возвращает путь к созданному файлу.
     """
-    agents, soft_by_agent, vulns = _load_data()
+    agents, soft_by_agent, prepared = _load_data()
 
     if output_dir is None:
         output_dir = Path(RESULTS_DIR)
@@ -318,6 +435,7 @@ def generate_vulnerability_report(output_dir: Path | None = None) -> Path:
 
     total_matches = 0
     host_labels: List[str] = []
+    index = build_token_index(prepared)
 
     for agent in agents:
         hostname = agent['hostname'] or agent['agent_id']
@@ -325,7 +443,9 @@ def generate_vulnerability_report(output_dir: Path | None = None) -> Path:
         host_label = f'{hostname} ({ip})' if ip else hostname
         host_labels.append(host_label)
 
-        matches = match_vulns_for_agent(agent, soft_by_agent, vulns)
+        matches = match_vulns_for_agent(
+            agent, soft_by_agent, prepared=prepared, index=index,
+        )
         if not matches:
             continue
 
@@ -355,7 +475,9 @@ def generate_vulnerability_report(output_dir: Path | None = None) -> Path:
             if url:
                 base_text += f' | Подробнее: {url}'
 
-            p.add_run(base_text)
+            # весь текст пункта собираем в строку и добавляем одним run:
+            # каждый add_run — отдельный XML-узел в документе
+            parts = [base_text]
 
             # перечисляем ПО на хосте, для которого мы решили, что оно может быть уязвимо
             for item in sw_list:
@@ -373,7 +495,9 @@ def generate_vulnerability_report(output_dir: Path | None = None) -> Path:
                 elif vcheck == 'unknown':
                     detail += ' — версия уязвимости не определена однозначно (требуется ручная проверка).'
 
-                p.add_run(detail)
+                parts.append(detail)
+
+            p.add_run(''.join(parts))
 
     doc.add_heading('Итог', level=2)
     if total_matches == 0:
@@ -1,9 +1,13 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
 
+import html as _html
+import queue
 import re
 import time
-from typing import Any, Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import unquote
 
 import pandas as pd
 from bs4 import BeautifulSoup
@@ -14,11 +18,41 @@ from selenium.webdriver.support.expected_conditions import (
 from selenium.webdriver.support.ui import WebDriverWait
 
 from .html_parser import BrowserHTMLParser
-from .db import url_exists
+from .db import urls_existing
+
+try:
+    # pip install lxml — C-парсер для BeautifulSoup, на порядок быстрее html.parser
+    import lxml  # noqa: F401
+    _BS_PARSER = 'lxml'
+except ImportError:
+    _BS_PARSER = 'html.parser'
 
 BASE_URL = 'https://securityvulnerability.io'
 LATEST_URL = f'{BASE_URL}/vulnerability/latest'
 
+# сколько браузеров параллельно разбирают карточки CVE
+DETAIL_WORKERS = 3
+
+# Шаблоны разбора страниц — компилируем один раз на модуль
+_WS_RE = re.compile(r'\s+')
+_CVE_RE = re.compile(r'CVE-\d{4}-\d+', re.IGNORECASE)
+_SEVERITY_RE = re.compile(r'\b(CRITICAL|HIGH|MEDIUM|LOW)\b', re.IGNORECASE)
+_SCORE_LABEL_RE = re.compile(r'(Score|CVSS)', re.IGNORECASE)
+_SCORE_RE = re.compile(r'(?:Score|CVSS)\s*[:\-]?\s*([0-9]{1,2}(?:\.[0-9])?)')
+_NUM_RE = re.compile(r'[0-9]{1,2}(?:\.[0-9])?')
+_DATE_DMY_RE = re.compile(r'(\d{1,2})\s+([A-Za-z]+)\s+(\d{4})')
+_DATE_MDY_RE = re.compile(r'([A-Za-z]+)\s+(\d{1,2}),\s*(\d{4})')
+_VERSIONS_RE = re.compile(r'Affected Version\(s\)\s*(.+?)\s*References', re.IGNORECASE)
+# <a ... href="...(/vulnerability/CVE-...)"> — то же, что a[href*="/vulnerability/CVE-"]
+_CVE_HREF_RE = re.compile(
+    r'<a\s[^>]*?\bhref\s*=\s*(["\'])([^"\'<>]*?/vulnerability/CVE-[^"\'<>]*)\1',
+    re.IGNORECASE,
+)
+_VENDOR_HREF_RE = re.compile(
+    r'<a\s[^>]*?\bhref\s*=\s*(["\'])(/vendor/[^"\'<>]*)\1',
+    re.IGNORECASE,
+)
+
 
 # ---------------------------------------------------------------------------
 # Вспомогательные утилиты
@@ -27,14 +61,40 @@ LATEST_URL = f'{BASE_URL}/vulnerability/latest'
 def _text_or_none(node) -> Optional[str]:
     if not node:
         return None
-    txt = ' '.join(str(node.get_text(' ', strip=True)).split())
+    txt = _WS_RE.sub(' ', str(node.get_text(' ', strip=True))).strip()
     return txt or None
 
 
 def _get_main_text(soup: BeautifulSoup) -> str:
     main = soup.find('main') or soup.body or soup
     text = main.get_text(' ', strip=True)
-    return ' '.join(text.split())
+    # один проход regex без промежуточного списка слов всей страницы
+    return _WS_RE.sub(' ', text).strip()
+
+
+# Опрос чаще дефолтных 0.5 с: быстрые страницы не ждут лишние полсекунды
+_WAIT_POLL = 0.1
+
+
+def _wait_for_css(driver, selector: str, wait_seconds: float) -> None:
+    """
+    Ждём появления элемента по CSS. Если он уже есть (страница отрисовалась
+    к моменту возврата driver.get) — одна проверка без WebDriverWait.
+    """
+    if driver.find_elements(By.CSS_SELECTOR, selector):
+        return
+    WebDriverWait(driver, wait_seconds, poll_frequency=_WAIT_POLL).until(
+        presence_of_element_located((By.CSS_SELECTOR, selector)),
+    )
+
+
+# Высота читается до прокрутки, как и раньше, но вместе с scrollTo —
+# один вызов WebDriver за раунд вместо двух
+_SCROLL_BOTTOM_JS = """
+const h = document.body.scrollHeight;
+window.scrollTo(0, h);
+return h;
+"""
 
 
 def _scroll_latest_page(
@@ -47,23 +107,20 @@ def _scroll_latest_page(
     driver = parser.driver
     driver.get(LATEST_URL)
 
-    WebDriverWait(driver, wait_seconds).until(
-        presence_of_element_located((By.CSS_SELECTOR, 'a[href^="/vulnerability/CVE-"]')),
-    )
+    _wait_for_css(driver, 'a[href^="/vulnerability/CVE-"]', wait_seconds)
 
     last_height = 0
     same_count = 0
     rounds = 0
 
     while rounds < max_rounds and same_count < stable_rounds:
-        new_height = driver.execute_script('return document.body.scrollHeight') or 0
+        new_height = driver.execute_script(_SCROLL_BOTTOM_JS) or 0
         if new_height <= last_height:
             same_count += 1
         else:
             same_count = 0
             last_height = new_height
 
-        driver.execute_script('window.scrollTo(0, document.body.scrollHeight);')
         time.sleep(pause)
         rounds += 1
 
@@ -71,59 +128,53 @@ def _scroll_latest_page(
 
 
 def _extract_latest_links(html: str) -> List[str]:
-    soup = BeautifulSoup(html, 'html.parser')
+    # Ссылки вынимаем одним regex по сырому HTML: строить дерево
+    # BeautifulSoup для ленты в тысячи карточек ради href не нужно
     urls: List[str] = []
-
-    for a in soup.select('a[href*="/vulnerability/CVE-"]'):
-        href = a.get('href') or ''
-        if '/vulnerability/CVE-' not in href:
-            continue
+    for m in _CVE_HREF_RE.finditer(html or ''):
+        href = m.group(2)
         full = href if href.startswith('http') else BASE_URL + href
         urls.append(full)
 
     # удаляем дубликаты, сохраняя порядок
-    seen: set[str] = set()
-    uniq: List[str] = []
-    for u in urls:
-        if u in seen:
-            continue
-        seen.add(u)
-        uniq.append(u)
-    return uniq
+    return list(dict.fromkeys(urls))
+
+
+_PRODUCT_TRANS = str.maketrans({'-': ' '})
 
 
 def _parse_vendor_product_from_vendor_links(
-    soup: BeautifulSoup,
+    html: str,
 ) -> tuple[Optional[str], Optional[str]]:
-    vendor_links = soup.select('a[href^="/vendor/"]')
-    vendors: List[str] = []
-    products: List[str] = []
-
-    for a in vendor_links:
-        href = a.get('href') or ''
-        if not href.startswith('/vendor/'):
-            continue
+    # href вынимаем regex по сырому HTML, как ссылки ленты: CSS-селектор
+    # BeautifulSoup обходит всё дерево ради одного атрибута
+    vendors: set[str] = set()
+    products: set[str] = set()
+
+    for m in _VENDOR_HREF_RE.finditer(html or ''):
+        href = m.group(2)
+        if '&' in href:
+            # в сыром HTML сущности не раскрыты (&amp; и т.п.), в soup — да
+            href = _html.unescape(href)
         parts = href.split('/')
         if len(parts) < 4:
             continue
         vendor_raw = parts[2] or ''
         product_raw = parts[3] or ''
 
+        # unquote раскрывает любые %XX (не только %20), split/join схлопывает пробелы
         if vendor_raw:
-            v = vendor_raw.replace('%20', ' ')
-            v = re.sub(r'\s+', ' ', v).strip()
+            v = ' '.join(unquote(vendor_raw).split())
             if v:
-                vendors.append(v)
+                vendors.add(v)
 
         if product_raw:
-            p = product_raw.replace('%20', ' ')
-            p = p.replace('-', ' ')
-            p = re.sub(r'\s+', ' ', p).strip()
+            p = ' '.join(unquote(product_raw).translate(_PRODUCT_TRANS).split())
             if p:
-                products.append(p)
+                products.add(p)
 
-    vendors_str = ', '.join(sorted(set(vendors))) if vendors else None
-    products_str = ', '.join(sorted(set(products))) if products else None
+    vendors_str = ', '.join(sorted(vendors)) if vendors else None
+    products_str = ', '.join(sorted(products)) if products else None
     return vendors_str, products_str
 
 
@@ -144,26 +195,34 @@ def _parse_cvss_and_severity(
     score_val: Optional[str] = None
     severity_val: Optional[str] = None
 
-    for s in cvss_block.stripped_strings:
-        m = re.search(r'\b(CRITICAL|HIGH|MEDIUM|LOW)\b', s, re.IGNORECASE)
-        if m:
-            severity_val = m.group(1).upper()
-            break
+    # Плоский текст блока собираем один раз; пробел-разделитель сохраняет
+    # границы слов, так что поиск по нему совпадает с поиском по строкам DOM
+    block_text = cvss_block.get_text(' ', strip=True)
 
-    for tag in cvss_block.find_all(string=re.compile(r'(Score|CVSS)', re.IGNORECASE)):
-        txt = tag.parent.get_text(' ', strip=True)
-        m = re.search(r'(?:Score|CVSS)\s*[:\-]?\s*([0-9]{1,2}(?:\.[0-9])?)', txt)
-        if m:
-            score_val = m.group(1)
-            break
+    m = _SEVERITY_RE.search(block_text)
+    if m:
+        severity_val = m.group(1).upper()
+
+    m = _SCORE_RE.search(block_text)
+    if m:
+        score_val = m.group(1)
+
+    # обход DOM — только если по плоскому тексту оценку не нашли
+    if score_val is None:
+        for tag in cvss_block.find_all(string=_SCORE_LABEL_RE):
+            txt = tag.parent.get_text(' ', strip=True)
+            m = _SCORE_RE.search(txt)
+            if m:
+                score_val = m.group(1)
+                break
 
     if score_val is None:
         for el in cvss_block.find_all(['span', 'div', 'p']):
             txt = el.get_text(strip=True)
-            if not re.fullmatch(r'[0-9]{1,2}(?:\.[0-9])?', txt):
+            if not _NUM_RE.fullmatch(txt):
                 continue
             parent_txt = el.parent.get_text(' ', strip=True)
-            if re.search(r'(Score|CVSS)', parent_txt, re.IGNORECASE):
+            if _SCORE_LABEL_RE.search(parent_txt):
                 score_val = txt
                 break
 
@@ -207,7 +266,7 @@ def _format_date_ddmmyyyy(day: int, month: int, year: int) -> str:
 
 
 def _extract_date_from_chunk(chunk: str) -> Optional[str]:
-    m = re.search(r'(\d{1,2})\s+([A-Za-z]+)\s+(\d{4})', chunk)
+    m = _DATE_DMY_RE.search(chunk)
     if m:
         day = int(m.group(1))
         month_name = m.group(2).lower()
@@ -216,7 +275,7 @@ def _extract_date_from_chunk(chunk: str) -> Optional[str]:
         if month:
             return _format_date_ddmmyyyy(day, month, year)
 
-    m = re.search(r'([A-Za-z]+)\s+(\d{1,2}),\s*(\d{4})', chunk)
+    m = _DATE_MDY_RE.search(chunk)
     if m:
         month_name = m.group(1).lower()
         day = int(m.group(2))
@@ -228,8 +287,8 @@ def _extract_date_from_chunk(chunk: str) -> Optional[str]:
     return None
 
 
-def _parse_published(soup: BeautifulSoup) -> Optional[str]:
-    text = _get_main_text(soup)
+def _parse_published(text: str) -> Optional[str]:
+    """text — уже собранный текст main (_get_main_text)."""
     low = text.lower()
     idx = low.find('published')
     if idx == -1:
@@ -242,13 +301,9 @@ def _parse_published(soup: BeautifulSoup) -> Optional[str]:
     return _extract_date_from_chunk(chunk)
 
 
-def _parse_versions(soup: BeautifulSoup) -> Optional[str]:
-    text = _get_main_text(soup)
-    m = re.search(
-        r'Affected Version\(s\)\s*(.+?)\s*References',
-        text,
-        flags=re.IGNORECASE,
-    )
+def _parse_versions(text: str) -> Optional[str]:
+    """text — уже собранный текст main (_get_main_text)."""
+    m = _VERSIONS_RE.search(text)
     if not m:
         return None
     versions = m.group(1).strip()
@@ -259,29 +314,34 @@ def _parse_versions(soup: BeautifulSoup) -> Optional[str]:
 # Основной разбор страницы CVE
 # ---------------------------------------------------------------------------
 
+# колонки строки карточки (и итогового DataFrame) в порядке вывода
+DETAIL_COLUMNS = (
+    'CVE',
+    'Заголовок',
+    'Вендор',
+    'Продукт',
+    'Опубликовано',
+    'CVSS',
+    'Критичность',
+    'Источник',
+)
+
+
 def _parse_detail_html(html: str, url: str) -> Dict[str, Any]:
     """Парсит страницу конкретной уязвимости."""
-    soup = BeautifulSoup(html, 'html.parser')
-
-    result: Dict[str, Any] = {
-        'CVE': None,
-        'Заголовок': None,
-        'Вендор': None,
-        'Продукт': None,
-        'Опубликовано': None,
-        'CVSS': None,
-        'Критичность': None,
-        'Источник': url,
-    }
+    soup = BeautifulSoup(html, _BS_PARSER)
+
+    result: Dict[str, Any] = dict.fromkeys(DETAIL_COLUMNS)
+    result['Источник'] = url
 
     # CVE: сперва из URL
-    m = re.search(r'(CVE-\d{4}-\d+)', url, re.IGNORECASE)
+    m = _CVE_RE.search(url)
     if m:
-        result['CVE'] = m.group(1).upper()
+        result['CVE'] = m.group(0).upper()
     else:
-        node = soup.find(string=re.compile(r'CVE-\d{4}-\d+', re.IGNORECASE))
+        node = soup.find(string=_CVE_RE)
         if node:
-            m2 = re.search(r'CVE-\d{4}-\d+', node, re.IGNORECASE)
+            m2 = _CVE_RE.search(node)
             if m2:
                 result['CVE'] = m2.group(0).upper()
 
@@ -289,16 +349,19 @@ def _parse_detail_html(html: str, url: str) -> Dict[str, Any]:
     h1 = soup.find('h1')
     result['Заголовок'] = _text_or_none(h1) or _text_or_none(soup.find('title'))
 
+    # текст main собираем один раз — он нужен и версиям, и дате
+    main_text = _get_main_text(soup)
+
     # вендор и базовый продукт
-    vendor_str, base_product_str = _parse_vendor_product_from_vendor_links(soup)
+    vendor_str, base_product_str = _parse_vendor_product_from_vendor_links(html)
     result['Вендор'] = vendor_str
 
     # версии (между Affected Version(s) и References) -> 'продукт + версия'
-    versions_str = _parse_versions(soup)
+    versions_str = _parse_versions(main_text)
     result['Продукт'] = versions_str or base_product_str
 
     # дата публикации
-    result['Опубликовано'] = _parse_published(soup)
+    result['Опубликовано'] = _parse_published(main_text)
 
     # CVSS / severity
     score, sev = _parse_cvss_and_severity(soup)
@@ -312,32 +375,31 @@ def _parse_detail_html(html: str, url: str) -> Dict[str, Any]:
 # Раскрытие кнопок 'View more...'
 # ---------------------------------------------------------------------------
 
+# Поиск и клики выполняются в браузере одним вызовом, а не XPath + click()
+# на каждую кнопку. Кликаем только самые вложенные элементы с 'view more':
+# у предков (div, body, ...) textContent тоже содержит эту фразу.
+_EXPAND_VIEW_MORE_JS = """
+const has = el => (el.textContent || '').toLowerCase().includes('view more');
+let clicked = 0;
+for (const el of document.querySelectorAll('body *')) {
+    if (!has(el) || Array.from(el.children).some(has)) continue;
+    try { el.click(); clicked++; } catch (e) {}
+}
+return clicked;
+"""
+
+
 def _expand_view_more(driver) -> None:
     for _ in range(3):
         try:
-            buttons = driver.find_elements(
-                By.XPATH,
-                "//*[contains(translate(normalize-space(.), "
-                "'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), "
-                "'view more')]",
-            )
+            clicked = driver.execute_script(_EXPAND_VIEW_MORE_JS)
         except Exception:
             break
 
-        if not buttons:
+        if not clicked:
             break
-
-        for btn in buttons:
-            try:
-                driver.execute_script(
-                    'arguments[0].scrollIntoView({block:"center"});',
-                    btn,
-                )
-                time.sleep(0.2)
-                btn.click()
-                time.sleep(0.5)
-            except Exception:
-                continue
+        # даём странице дорисовать раскрытые блоки перед следующим проходом
+        time.sleep(0.3)
 
 
 def _fetch_detail(
@@ -347,9 +409,7 @@ def _fetch_detail(
 ) -> Dict[str, Any]:
     driver = parser.driver
     driver.get(url)
-    WebDriverWait(driver, wait_seconds).until(
-        presence_of_element_located((By.CSS_SELECTOR, 'h1, h2')),
-    )
+    _wait_for_css(driver, 'h1, h2', wait_seconds)
 
     _expand_view_more(driver)
 
@@ -361,11 +421,62 @@ def _fetch_detail(
 # Публичная функция
 # ---------------------------------------------------------------------------
 
+def _detail_worker(
+    parser: Optional[BrowserHTMLParser],
+    jobs: 'queue.Queue[Tuple[int, str]]',
+    results: List[Optional[Dict[str, Any]]],
+    total: int,
+    wait_seconds: int,
+    headless: bool,
+    status_q: Optional[Any],
+    progress_q: Optional[Any],
+) -> None:
+    """
+    Поток разбора карточек: берёт (номер, url) из общей очереди, пока она
+    не опустеет. parser=None — поток поднимает свой браузер и сам его закрывает.
+    """
+    owned = parser is None
+    if owned:
+        try:
+            parser = BrowserHTMLParser(headless=headless)
+        except Exception as exc:
+            # обойдёмся меньшим числом браузеров — очередь разберут остальные
+            if status_q:
+                status_q.put(f'[sv_latest] Дополнительный браузер не запущен: {exc}')
+            return
+
+    try:
+        while True:
+            try:
+                idx, url = jobs.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                data = _fetch_detail(parser, url, wait_seconds=wait_seconds)
+                results[idx] = data
+                if status_q:
+                    cve = data.get('CVE') or ''
+                    status_q.put(f'[sv_latest] [{idx + 1}/{total}] {cve} OK')
+            except Exception as exc:
+                if status_q:
+                    status_q.put(f'[sv_latest] Ошибка парсинга {url}: {exc}')
+            finally:
+                if progress_q:
+                    progress_q.put(1)
+    finally:
+        if owned:
+            try:
+                parser.close()
+            except Exception:
+                pass
+
+
 def scrape_latest(
     headless: bool = True,
     wait_seconds: int = 30,
     status_q: Optional[Any] = None,
     progress_q: Optional[Any] = None,
+    detail_workers: int = DETAIL_WORKERS,
 ) -> pd.DataFrame:
     parser = BrowserHTMLParser(headless=headless)
     try:
@@ -378,35 +489,56 @@ def scrape_latest(
         if status_q:
             status_q.put(f'[sv_latest] Найдено ссылок на уязвимости: {len(urls)}')
 
-        if progress_q:
-            progress_q.put(('TOTAL', len(urls)))
-
-        rows: List[Dict[str, Any]] = []
-        total = len(urls)
-
-        for idx, url in enumerate(urls, start=1):
-            try:
-                if url_exists(url, source='news'):
-                    if status_q:
-                        status_q.put(
-                            f'[sv_latest] URL уже есть в БД ({url}), '
-                            'останавливаю парсинг новостей.',
-                        )
-                    break
-
-                data = _fetch_detail(parser, url, wait_seconds=wait_seconds)
-                rows.append(data)
-                if status_q:
-                    cve = data.get('CVE') or ''
-                    status_q.put(f'[sv_latest] [{idx}/{total}] {cve} OK')
-            except Exception as exc:
+        # какие ссылки ленты уже сохранены — пачечным IN-запросом по индексу,
+        # а не SELECT на каждую ссылку и не выгрузкой всех url новостей.
+        # Лента отсортирована от новых к старым: всё после первой известной
+        # ссылки уже в БД, поэтому срез считаем заранее — потокам не нужен
+        # общий флаг остановки
+        known_urls = urls_existing(urls, source='news')
+        for pos, url in enumerate(urls):
+            if url in known_urls:
                 if status_q:
-                    status_q.put(f'[sv_latest] Ошибка парсинга {url}: {exc}')
-            finally:
-                if progress_q:
-                    progress_q.put(1)
+                    status_q.put(
+                        f'[sv_latest] URL уже есть в БД ({url}), '
+                        'останавливаю парсинг новостей.',
+                    )
+                urls = urls[:pos]
+                break
 
-        return pd.DataFrame.from_records(rows)
+        total = len(urls)
+        if progress_q:
+            progress_q.put(('TOTAL', total))
+        if not urls:
+            return pd.DataFrame()
+
+        jobs: 'queue.Queue[Tuple[int, str]]' = queue.Queue()
+        for job in enumerate(urls):
+            jobs.put(job)
+        results: List[Optional[Dict[str, Any]]] = [None] * total
+
+        # Карточки независимы, время уходит на сеть и ожидание страниц —
+        # разбираем их несколькими браузерами. Первый поток использует уже
+        # открытый браузер, остальные поднимают свои.
+        n_workers = max(1, min(int(detail_workers or 1), total))
+        with ThreadPoolExecutor(max_workers=n_workers) as ex:
+            futures = [
+                ex.submit(
+                    _detail_worker,
+                    parser if i == 0 else None,
+                    jobs, results, total, wait_seconds, headless,
+                    status_q, progress_q,
+                )
+                for i in range(n_workers)
+            ]
+            for fut in futures:
+                fut.result()
+
+        # порядок строк — как в ленте; собираем сразу по колонкам,
+        # без транспонирования списка словарей в from_records
+        rows = [r for r in results if r is not None]
+        if not rows:
+            return pd.DataFrame()
+        return pd.DataFrame({c: [r[c] for r in rows] for c in DETAIL_COLUMNS})
 
     finally:
         try:
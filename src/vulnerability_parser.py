@@ -52,6 +52,24 @@ class VulnerabilityParser:
         except Exception:
             return pd.DataFrame([{'should_stop': True}])
 
+    def parse_vulnerability_row(self, html: str, url: str) -> Optional[Dict[str, str]]:
+        """
+        Данные карточки одной строкой-dict, без DataFrame на каждую страницу:
+        воркер копит такие строки и собирает DataFrame один раз при записи части.
+        None — страницу пропускаем (нет таблицы/данных или ошибка разбора).
+        """
+        try:
+            soup = BeautifulSoup(html, 'html.parser')
+            data_list = self._extract_data(soup, url)
+        except Exception:
+            return None
+        if not data_list:
+            return None
+        row = data_list[0]
+        if 'should_skip' in row or 'should_stop' in row:
+            return None
+        return row
+
     def _extract_data(self, soup: BeautifulSoup, url: str) -> List[Dict[str, str]]:
         data_list: List[Dict[str, str]] = []
 
@@ -12,13 +12,73 @@ from src.vulnerability_parser import VulnerabilityParser
 from src.exceptions import PageNotFoundError, PageLoadError
 
 
-def _emit(status_q: Optional[mp.Queue], text: str) -> None:
-    if status_q is None:
-        return
+# Очереди — mp.SimpleQueue (у put нет block/timeout) или mp.Queue:
+# вызываем put без аргументов, чтобы подходили обе
+class _QueueBatcher:
+    """
+    Копит сообщения воркера и отправляет их в очередь одним put:
+    список из нескольких статусов (str) и прогресса (int) вместо put на каждое.
+    Подряд идущие числа складываются. Одиночное сообщение уходит как есть.
+    """
+
+    def __init__(self, q: Optional[mp.SimpleQueue], max_items: int = 16) -> None:
+        self.q = q
+        self.max_items = max_items
+        self.buf: List[object] = []
+
+    def add(self, item: object) -> None:
+        if self.q is None:
+            return
+        if isinstance(item, int):
+            if item <= 0:
+                return
+            if self.buf and type(self.buf[-1]) is int:
+                self.buf[-1] += item
+                return
+        self.buf.append(item)
+        if len(self.buf) >= self.max_items:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self.buf:
+            return
+        payload = self.buf[0] if len(self.buf) == 1 else self.buf
+        self.buf = []
+        try:
+            self.q.put(payload)
+        except Exception:
+            pass
+
+
+def _write_rows(out_dir: str, rows: List[dict], stem: str) -> None:
+    """
+    Часть результатов пишем в Parquet (snappy): колоночный бинарный формат
+    читается в processing без токенизации CSV. Все значения — строки
+    (пустые — None), как при чтении CSV с dtype=str.
+    Без pyarrow или при ошибке записи — прежний CSV.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    df = pd.DataFrame(rows)
+    pq_path = os.path.join(out_dir, f'{stem}.parquet')
     try:
-        status_q.put(text, block=False)
+        df.astype(str).where(df.notna(), None).to_parquet(
+            pq_path,
+            engine='pyarrow',
+            compression='snappy',
+            index=False,
+        )
+        return
     except Exception:
-        pass
+        try:
+            os.remove(pq_path)
+        except OSError:
+            pass
+
+    df.to_csv(
+        os.path.join(out_dir, f'{stem}.csv'),
+        index=False,
+        encoding='utf-8-sig',
+    )
 
 
 def _flush_parts(
@@ -27,16 +87,13 @@ def _flush_parts(
     reserved: List[str],
     missed404: List[str],
     prefix: str = '',
+    part_id: Optional[str] = None,
 ) -> None:
     os.makedirs(out_dir, exist_ok=True)
-    pid = os.getpid()
+    pid = part_id or os.getpid()
 
     if rows:
-        pd.DataFrame(rows).to_csv(
-            os.path.join(out_dir, f'{prefix}part_{pid}.csv'),
-            index=False,
-            encoding='utf-8-sig',
-        )
+        _write_rows(out_dir, rows, f'{prefix}part_{pid}')
 
     if reserved:
         with open(
@@ -55,87 +112,111 @@ def _flush_parts(
             f.write('\n'.join(missed404))
 
 
+# Сколько строк держим в памяти: каждые FLUSH_EVERY строк уходят в свой
+# файл части (part_<pid>_<n>), а не копятся до конца чанка
+FLUSH_EVERY = 200
+
+
 def worker_loop(
     task_ids: List[str],
     out_dir: str,
-    progress_q: Optional[mp.Queue],
-    status_q: Optional[mp.Queue],
+    progress_q: Optional[mp.SimpleQueue],
+    status_q: Optional[mp.SimpleQueue],
+    part_id: Optional[str] = None,
+    driver: Optional[BrowserHTMLParser] = None,
 ) -> None:
+    """
+    driver — уже запущенный браузер (пул процессов держит один на все батчи);
+    такой браузер здесь не закрываем. Без него поднимаем свой на этот чанк.
+    """
     base_url = 'https://bdu.fstec.ru/vul/'
     rows: List[Dict] = []
     reserved: List[str] = []
     missed404: List[str] = []
+    # одна очередь у GUI: статус и тик прогресса по ID уходят одним put
+    status = _QueueBatcher(status_q)
+    progress = status if progress_q is status_q else _QueueBatcher(progress_q)
 
+    owned = driver is None
     try:
-        driver = BrowserHTMLParser(headless=True)
-        for w in getattr(driver, 'warnings', []) or []:
-            _emit(status_q, w)
+        if owned:
+            driver = BrowserHTMLParser(headless=True)
+            for w in getattr(driver, 'warnings', []) or []:
+                status.add(w)
     except Exception:
         for vid in task_ids:
             url = f'{base_url}{vid}'
-            _emit(status_q, f'Сбор информации с {url}... Пропущено!')
+            status.add(f'Сбор информации с {url}... Пропущено!')
             reserved.append(url)
-            if progress_q is not None:
-                try:
-                    progress_q.put(1, block=False)
-                except Exception:
-                    pass
-        _flush_parts(out_dir, rows, reserved, missed404)
+        # браузер не поднялся — весь чанк засчитываем одним сообщением
+        progress.add(len(task_ids))
+        status.flush()
+        progress.flush()
+        _flush_parts(out_dir, rows, reserved, missed404, part_id=part_id)
         return
 
     parser = VulnerabilityParser()
+    pid = part_id or os.getpid()
+    flushed = 0
 
     for vuln_id in task_ids:
         url = f'{base_url}{vuln_id}'
         status_sent = False
         try:
             html = None
+            # накопленное отправляем до долгой загрузки страницы, чтобы
+            # сообщения не ждали в буфере
+            status.flush()
+            progress.flush()
             try:
-                html = driver.fetch_html(url, wait_time=5)
+                # карточка БДУ готова, когда появилась основная таблица
+                html = driver.fetch_html(url, wait_time=5, wait_for='table.table')
             except PageNotFoundError:
-                _emit(status_q, f'Сбор информации с {url}... Ошибка 404')
+                status.add(f'Сбор информации с {url}... Ошибка 404')
                 missed404.append(url)
                 status_sent = True
             except PageLoadError:
-                _emit(status_q, f'Сбор информации с {url}... Пропущено!')
+                status.add(f'Сбор информации с {url}... Пропущено!')
                 reserved.append(url)
                 status_sent = True
             except Exception:
-                _emit(status_q, f'Сбор информации с {url}... Пропущено!')
+                status.add(f'Сбор информации с {url}... Пропущено!')
                 reserved.append(url)
                 status_sent = True
 
             if html:
                 try:
-                    df = parser.parse_vulnerability_data(html, url)
-                    has_skip = (
-                        ('should_skip' in df.columns)
-                        or ('should_stop' in df.columns)
-                    )
-                    if not df.empty and not has_skip:
-                        rows.extend(df.to_dict(orient='records'))
-                        _emit(status_q, f'Сбор информации с {url}... Успешно!')
+                    row = parser.parse_vulnerability_row(html, url)
+                    if row is not None:
+                        rows.append(row)
+                        status.add(f'Сбор информации с {url}... Успешно!')
                         status_sent = True
                     else:
-                        _emit(status_q, f'Сбор информации с {url}... Пропущено!')
+                        status.add(f'Сбор информации с {url}... Пропущено!')
                         reserved.append(url)
                         status_sent = True
                 except Exception:
-                    _emit(status_q, f'Сбор информации с {url}... Пропущено!')
+                    status.add(f'Сбор информации с {url}... Пропущено!')
                     reserved.append(url)
                     status_sent = True
         finally:
             if not status_sent:
-                _emit(status_q, f'Сбор информации с {url}... Пропущено!')
+                status.add(f'Сбор информации с {url}... Пропущено!')
                 reserved.append(url)
-            if progress_q is not None:
-                try:
-                    progress_q.put(1, block=False)
-                except Exception:
-                    pass
-
-    _flush_parts(out_dir, rows, reserved, missed404)
-    try:
-        driver.close()
-    except Exception:
-        pass
+            progress.add(1)
+
+        if len(rows) >= FLUSH_EVERY:
+            # промежуточная часть: память воркера ограничена, а уже собранное
+            # переживёт падение процесса; processing склеивает все part_*
+            _write_rows(out_dir, rows, f'part_{pid}_{flushed}')
+            rows.clear()
+            flushed += 1
+
+    status.flush()
+    progress.flush()
+    _flush_parts(out_dir, rows, reserved, missed404, part_id=part_id)
+    if owned:
+        try:
+            driver.close()
+        except Exception:
+            pass